@@ -9,116 +9,74 @@ Original file is located at
 Preprocessing func and mfcc extraction
 """
 
-from google.colab import drive
-drive.mount('/content/drive')
 import os
-import librosa
-import librosa.display
+from functools import partial
+
 import numpy as np
-import matplotlib.pyplot as plt
-import scipy.signal
+
+try: # Colab only; everything below also runs from a plain checkout
+    from google.colab import drive
+    drive.mount('/content/drive')
+except ImportError:
+    pass
+
+from vqspeaker import cache
+from vqspeaker import (add_codebook, average_distortions, best_speakers, compute_sample_time, confusion_matrix, decimation_sweep, decision_margins,
+                       early_report, extract_mfcc_batch, featurize_audio, featurize_params, hierarchy_curve, identify, index_report, joint_accuracies,
+                       joint_distortions, load_model, model_codebooks, notch_sweep, open_feature_store, open_registry, parallel_map, phrase_views,
+                       report_decode_timings, run_replay, save_model, speaker_views, store_labels, top_k_accuracy, train_vq_codebook_per_speaker,
+                       true_ranks, vad_report, validate_dtype, write_feature_store)
+from vqspeaker.plotting import compare_mfcc, plot_mel_filterbank, plot_stft, plot_vq_codebook_umap, plot_waveform
+
+cache.CACHE_DIR = "/content/drive/MyDrive/mfcc_cache"
+SHOW_PLOTS = False # per-file waveform/STFT/MFCC/filterbank figures and the UMAP plot
+VALIDATE_DTYPE = False # rerun every data set in float32 and float64 and compare decisions (last cell)
+INDEX_REPORT = False # compare centroid-index identification with exact matching on the 2024 and 2025 sets
+SEARCH_CURVE = False # accuracy vs latency of coarse-to-fine search over shortlist sizes, 2024 and 2025 sets
+EARLY_REPORT = False # frames needed per decision when scoring stops once the leading speaker is clear, 2024 and 2025 sets
+DECIMATION_SWEEP = False # accuracy vs scoring throughput when only every n-th / random / representative frames are scored, 2024 and 2025 sets
+SCORE_REPORT = False # top-k accuracy, decision margins and confusions from the score matrix, 2024 and 2025 sets
+STREAM_REPLAY = False # replay every test file at once through the streaming service, in real time, 2024 and 2025 sets
+USE_VAD = False # every data set: MFCC, training and scoring on speech frames only (energy + zero-crossing VAD)
+VAD_REPORT = False # frames removed, speed-up and accuracy change from VAD per data set (last cell)
+TRAIN_BATCH_SIZE = None # frames per mini-batch when training codebooks; None clusters all of a speaker's frames at once
+TRAIN_WORKERS = os.cpu_count() or 1 # speakers (and phrases) trained in parallel, one process each
+decode_timings = [] # per-file decode/resample times of the cache misses, reported and cleared after the 2024 and 2025 sets
 
 # Path link
 DRIVE_PATH = "/content/drive/MyDrive/GivenSpeech_Data/Training_Data"
 audio_files = ["s1.wav", "s2.wav", "s3.wav","s4.wav","s5.wav","s6.wav","s7.wav","s8.wav","s9.wav","s10.wav","s11.wav"]
 
 mfcc_features = {}
-labels = {}
-
-def load_audio(file_name, base_path, sr=16000): # load audio from selected path
-    file_path = os.path.join(base_path, file_name)
-    if not os.path.exists(file_path):
-        print(f"file{file_path}non-exist！")
-        return None, None
-    signal, sample_rate = librosa.load(file_path, sr=sr)
-    return signal, sample_rate
-
-def normalize_audio(signal):
-    return (signal - np.mean(signal)) / np.std(signal) # np.ndarray
-
-def lowpass_filter(signal, sr, cutoff=3000, order=5):
-    nyquist = 0.5 * sr
-    normal_cutoff = cutoff / nyquist
-    b, a = scipy.signal.butter(order, normal_cutoff, btype='low', analog=False)
-    filtered_signal = scipy.signal.filtfilt(b, a, signal)
-    return filtered_signal # np.ndarray
-
-def compute_sample_time(sr, N=256):
-    time_ms = (N / sr) * 1000
-    print(f"sample time: {time_ms:.2f} ms")
-
-def compute_mfcc(signal, sr, n_mfcc=26, n_fft=1024, hop_length=256):
-    mfccs = librosa.feature.mfcc(y=signal, sr=sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length)
-    return mfccs # np.ndarray
-
-def plot_waveform(signal, sr, title="Waveform"):
-    plt.figure(figsize=(10, 4))
-    librosa.display.waveshow(signal, sr=sr)
-    plt.title(title)
-    plt.xlabel("Time (s)")
-    plt.ylabel("Amplitude")
-    plt.show()
-
-
-def plot_stft(signal, sr, n_fft=1024, hop_length=256, title="STFT Spectrogram"):
-    D = librosa.stft(signal, n_fft=n_fft, hop_length=hop_length)
-    D_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
-    plt.figure(figsize=(10, 4))
-    librosa.display.specshow(D_db, sr=sr, hop_length=hop_length, x_axis='time', y_axis='log')
-    plt.colorbar(label="Decibels (dB)")
-    plt.title(title)
-    plt.show()
-
-# Different window sizes mfcc
-def compare_mfcc(signal, sr):
-    n_fft_values = [128, 256, 512]
-    plt.figure(figsize=(12, 6))
-    for i, n_fft in enumerate(n_fft_values):
-        mfccs = compute_mfcc(signal, sr, n_mfcc=26, n_fft=n_fft, hop_length=n_fft//2)
-        plt.subplot(1, 3, i+1)
-        librosa.display.specshow(mfccs, sr=sr, x_axis='time')
-        plt.colorbar(label="MFCC Coefficients")
-        plt.title(f"MFCC (N={n_fft})")
-    plt.tight_layout()
-    plt.show()
-
-def plot_mel_filterbank(sr=16000, n_fft=1024, n_mels=26):
-    mel_filters = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
-    plt.figure(figsize=(10, 4))
-    for i in range(mel_filters.shape[0]):
-        plt.plot(mel_filters[i], label=f"Mel {i+1}")
-    plt.title("Mel-Spaced Filterbank")
-    plt.xlabel("Frequency Bin")
-    plt.ylabel("Amplitude")
-    plt.show()
+file_paths = {} # speaker -> path per file, parallel to mfcc_features, names the feature store entries
 
 # Preprocess function
 # Return value: filtered_signal and mfcc_matrix
-def process_audio(file_name, base_path, speaker_id):
-    signal, sr = load_audio(file_name=file_name, base_path=base_path)
-    normalized_signal = normalize_audio(signal)
-    filtered_signal = lowpass_filter(normalized_signal, sr)
-    mfccs = compute_mfcc(filtered_signal, sr)
-
-    compute_sample_time(sr)
-    plot_waveform(filtered_signal, sr, title=f"Filtered Waveform: {file_name}")
-    plot_stft(filtered_signal, sr, title=f"STFT Spectrogram: {file_name}")
-    compare_mfcc(filtered_signal, sr)
-    plot_mel_filterbank(sr, n_fft=1024, n_mels=26)
+def process_audio(file_name, base_path, speaker_id, featurized=None, plot=False): # featurized: precomputed featurize_audio output
+    filtered_signal, sr, mfccs, timings = featurized or featurize_audio(file_name, base_path, plot=plot, vad=USE_VAD) # signal is None on a cache hit without plot
+    decode_timings.extend(timings)
+
+    if plot:
+        compute_sample_time(sr)
+        plot_waveform(filtered_signal, sr, title=f"Filtered Waveform: {file_name}")
+        plot_stft(filtered_signal, sr, title=f"STFT Spectrogram: {file_name}")
+        compare_mfcc(filtered_signal, sr)
+        plot_mel_filterbank(sr, n_fft=1024, n_mels=26)
 
     # Assure PERSON in dictionary
     if speaker_id not in mfcc_features:
         mfcc_features[speaker_id] = []  # initialization
-        labels[speaker_id] = []
+        file_paths[speaker_id] = []
 
     mfcc_features[speaker_id].append(mfccs.T)
-    labels[speaker_id].append(np.full(mfccs.shape[1], speaker_id))
+    file_paths[speaker_id].append(os.path.join(base_path, file_name))
     return filtered_signal, mfccs
 
 
+featurized = parallel_map(partial(featurize_audio, base_path=DRIVE_PATH, plot=SHOW_PLOTS, vad=USE_VAD), audio_files) # decodes only cache misses, or every file when plotting
 for i, file in enumerate(audio_files):
     speaker_id = i + 1  # speaker ID starts from 1
-    filtered_signal, mfccs = process_audio(file, DRIVE_PATH, speaker_id)
+    filtered_signal, mfccs = process_audio(file, DRIVE_PATH, speaker_id, featurized[i], plot=SHOW_PLOTS)
 
 """
 
@@ -126,62 +84,38 @@ for i, file in enumerate(audio_files):
 
 """
 
-#print(len(labels))
-#print(labels)
 #print(len(mfcc_features))
 
-from scipy.cluster.vq import kmeans, vq
-
-def normalize_mfcc(mfcc_features):
-    mfcc_features = np.vstack(mfcc_features)
-    mean = np.mean(mfcc_features, axis=0)
-    std = np.std(mfcc_features, axis=0)
-    return (mfcc_features - mean) / std
+"""Packed feature store"""
 
+STORE_DIR = "/content/drive/MyDrive/feature_store"
 
-def lbg_algorithm(features, num_clusters=16, epsilon=0.01):
-    codebook, _ = kmeans(features, 1)
-    while codebook.shape[0] < num_clusters:
-        new_codebook = np.vstack([codebook * (1 + epsilon), codebook * (1 - epsilon)])
-        new_codebook, _ = kmeans(features, new_codebook.shape[0])
-        codebook = new_codebook
-    return codebook
+feature_store = open_feature_store(write_feature_store(os.path.join(STORE_DIR, "given_speech"), mfcc_features, file_names=file_paths))
+vq_codebooks = train_vq_codebook_per_speaker(speaker_views(feature_store), num_clusters=16, batch_size=TRAIN_BATCH_SIZE, num_workers=TRAIN_WORKERS)
 
-def train_vq_codebook_per_speaker(mfcc_features, num_clusters=16):
-    speaker_codebooks = {}
-    for speaker_id, features in mfcc_features.items():
-        features = np.vstack(features)  # combine features of this guy
-        codebook = lbg_algorithm(features, num_clusters)  # train with lbg
-        speaker_codebooks[speaker_id] = codebook
-    return speaker_codebooks
+"""Codebook registry"""
 
-vq_codebooks = train_vq_codebook_per_speaker(mfcc_features, num_clusters=16)
+# persistent copy of the codebooks; a new student is added later without retraining the others:
+#   enroll(registry, speaker_id, [mfcc matrices of their files], num_clusters=16)
+# remove(registry, speaker_id) drops one, registry_codebooks(registry) gives the dict back
+REGISTRY_DIR = "/content/drive/MyDrive/vq_registry"
 
-"""visualize codebook"""
+registry = open_registry(os.path.join(REGISTRY_DIR, "given_speech"))
+for speaker_id, codebook in vq_codebooks.items():
+    add_codebook(registry, speaker_id, codebook)
 
-import umap
+"""Model file"""
 
-def plot_vq_codebook_umap(mfcc_features, labels, codebooks):
-    all_mfcc_features = np.vstack([np.vstack(features) for features in mfcc_features.values()])
-    all_labels = np.concatenate([np.concatenate(label) for label in labels.values()])
-    reducer = umap.UMAP(n_components=2, n_neighbors=20, min_dist=0.05, metric='euclidean') #dimension reduce
-    reduced_mfcc = reducer.fit_transform(all_mfcc_features)
-    reduced_codebooks = {speaker: reducer.transform(codebooks[speaker]) for speaker in codebooks}
+# all codebooks in one memory-mapped file with the feature parameters they were trained on,
+# so a scoring process loads it in milliseconds instead of retraining
+MODEL_DIR = "/content/drive/MyDrive/vq_models"
 
-    plt.figure(figsize=(8, 6))
-    scatter = plt.scatter(reduced_mfcc[:, 0], reduced_mfcc[:, 1], c=all_labels, cmap='rainbow', alpha=0.3, label="MFCC Features")
-    # mark x on graph
-    for speaker, reduced_codebook in reduced_codebooks.items():
-        plt.scatter(reduced_codebook[:, 0], reduced_codebook[:, 1], marker='x', s=100, label=f"Speaker {speaker}")
+model_path = save_model(os.path.join(MODEL_DIR, "given_speech"), vq_codebooks, featurize_params(vad=USE_VAD)) # the front end featurize_audio ran
 
-    plt.colorbar(scatter, label="Speaker ID")
-    plt.title("VQ Codebook Clustering in 2D Space")
-    plt.xlabel("Dimension 1")
-    plt.ylabel("Dimension 2")
-    plt.legend()
-    plt.show()
+"""visualize codebook"""
 
-plot_vq_codebook_umap(mfcc_features, labels, vq_codebooks)
+if SHOW_PLOTS:
+    plot_vq_codebook_umap(feature_store["frames"], store_labels(feature_store), vq_codebooks)
 
 """Original Test data features extract"""
 
@@ -190,45 +124,28 @@ test_audio_files = ["s1.wav", "s2.wav", "s3.wav", "s4.wav", "s5.wav", "s6.wav",
 test_mfcc_features = []
 test_labels = []
 
-def process_test_audio(file_name):
-    signal, sr = load_audio(file_name=file_name, base_path=test_drive_path)
-    normalized_signal = normalize_audio(signal)
-    filtered_signal = lowpass_filter(normalized_signal, sr)
-    mfccs = compute_mfcc(filtered_signal, sr)
+def process_test_audio(file_name): # same front end (and VAD setting) as the training files
+    _, _, mfccs, _ = featurize_audio(file_name, test_drive_path, vad=USE_VAD)
     return mfccs.T
 
 # featuring testing set
-for file in test_audio_files:
-    mfcc_matrix = process_test_audio(file)
+for mfcc_matrix in parallel_map(process_test_audio, test_audio_files):
     test_mfcc_features.append(mfcc_matrix)
 
+# codebooks from the model file; load_model raises if the test features were extracted with other parameters
+vq_codebooks = model_codebooks(load_model(model_path, featurize_params(vad=USE_VAD)))
+
 # print(len(test_mfcc_features))
 
 # print(len(mfcc_features))
 
 """Matching Speakers"""
 
-from scipy.spatial.distance import cdist
-
-def match_speaker(test_mfcc, codebook):
-    distances = cdist(test_mfcc, codebook, metric='euclidean')  # distance to codebook
-    avg_distance = np.mean(np.min(distances, axis=1))  # avg min dist
-    return avg_distance
-
 # Matching training and testing speakers
-results = {}
-
-for i, test_mfcc in enumerate(test_mfcc_features):
-    min_dist = float('inf')
-    best_speaker = None
-    for speaker_id in range(1, len(audio_files) + 1):
-        if speaker_id in vq_codebooks:
-            dist = match_speaker(test_mfcc, vq_codebooks[speaker_id])  # return avg min dist
-            if dist < min_dist:
-                min_dist = dist
-                best_speaker = speaker_id # matching best speaker id
-
-    results[test_audio_files[i]] = best_speaker
+# (test files x speakers) avg min dist in one pass, speakers in id order so ties still go to the lower id
+given_codebooks = {speaker_id: vq_codebooks[speaker_id] for speaker_id in range(1, len(audio_files) + 1) if speaker_id in vq_codebooks}
+given_scores = average_distortions(test_mfcc_features, given_codebooks)
+results = dict(zip(test_audio_files, best_speakers(*given_scores)))
 
 for test_file, speaker in results.items():
     print(f"TEST file {test_file} might be SPEAKER id: {speaker}")
@@ -237,37 +154,17 @@ for test_file, speaker in results.items():
 
 """Notch filter"""
 
-def notch_filter(signal, sr, freq, quality_factor=42):
-    b, a = scipy.signal.iirnotch(freq, quality_factor, sr)
-    return scipy.signal.filtfilt(b, a, signal)
-
-def process_test_audio_with_notch(file_name, notch_freq):
-    signal, sr = load_audio(file_name=file_name, base_path=test_drive_path)
-    if signal is None:
-        return None
-    normalized_signal = normalize_audio(signal)
-    filtered_signal = notch_filter(normalized_signal, sr, freq=notch_freq)
-    return compute_mfcc(filtered_signal, sr).T
-
 # Frequencies to test
 notch_frequencies = [50, 100, 200, 500, 1000]
 
-notch_test_results = {}
+# (frequency x file x speaker) avg distortions; every test file decoded once, all variants scored together
+notch_paths = [os.path.join(test_drive_path, file) for file in test_audio_files]
+notch_distortions, notch_speakers = notch_sweep(notch_paths, notch_frequencies, vq_codebooks, vad=USE_VAD)
 
-for freq in notch_frequencies:
-    test_mfcc_features = [process_test_audio_with_notch(file, freq) for file in test_audio_files]
-    # Matching speakers
-    results = {}
-    for i, test_mfcc in enumerate(test_mfcc_features):
-        min_dist = float('inf')
-        best_speaker = None
-        for speaker_id in vq_codebooks:
-            dist = match_speaker(test_mfcc, vq_codebooks[speaker_id])
-            if dist < min_dist:
-                min_dist = dist
-                best_speaker = speaker_id
-        results[test_audio_files[i]] = best_speaker
-    notch_test_results[freq] = results
+notch_test_results = {}
+for f, freq in enumerate(notch_frequencies):
+    best = notch_distortions[f].argmin(axis=1) # matching best speaker per file
+    notch_test_results[freq] = {file: notch_speakers[j] for file, j in zip(test_audio_files, best)}
 
 for freq, matches in notch_test_results.items():
     print(f"Notch Frequency: {freq} hz")
@@ -298,46 +195,25 @@ valid_test_files = [f for f in selected_test_files if os.path.exists(os.path.joi
 #print("Available test files:", test_files)
 #print("Selected valid test files:", valid_test_files)
 
-def extract_mfcc(file_path, sr=16000, n_mfcc=26, n_fft=1024, hop_length=256):# extract, but with file path
-    signal, _ = librosa.load(file_path, sr=sr)
-    mfccs = librosa.feature.mfcc(y=signal, sr=sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length)
-    return mfccs.T
-
 mfcc_features = {}
-for file in valid_train_files:
+train_mfccs = extract_mfcc_batch([os.path.join(train_path, f) for f in valid_train_files], vad=USE_VAD, timings=decode_timings)
+for file, mfcc_matrix in zip(valid_train_files, train_mfccs):
     speaker_id = int(file.split("Zero_train")[-1].split(".wav")[0])
-    file_path = os.path.join(train_path, file)
-    mfcc_matrix = extract_mfcc(file_path)
     if speaker_id not in mfcc_features:
         mfcc_features[speaker_id] = []
     mfcc_features[speaker_id].append(mfcc_matrix)
 
-vq_codebooks = train_vq_codebook_per_speaker(mfcc_features, num_clusters=16)
+vq_codebooks = train_vq_codebook_per_speaker(mfcc_features, num_clusters=16, batch_size=TRAIN_BATCH_SIZE, num_workers=TRAIN_WORKERS)
 
 # Extract mfcc features for selected test data
 test_mfcc_features = []
 true_labels = []
-for file in valid_test_files:
-    file_path = os.path.join(test_path, file)
-    mfcc_matrix = extract_mfcc(file_path)
+test_mfccs = extract_mfcc_batch([os.path.join(test_path, f) for f in valid_test_files], vad=USE_VAD, timings=decode_timings)
+for file, mfcc_matrix in zip(valid_test_files, test_mfccs):
     test_mfcc_features.append(mfcc_matrix)
     true_labels.append(int(file.split("Zero_test")[-1].split(".wav")[0]))
 
-def match_speaker(test_mfcc, codebooks):  # function overload, for codebooks
-    min_dist = float('inf')
-    best_speaker = None
-    for speaker_id, codebook in codebooks.items():
-        distances = cdist(test_mfcc, codebook, metric='euclidean')
-        avg_distance = np.mean(np.min(distances, axis=1))
-        if avg_distance < min_dist:
-            min_dist = avg_distance
-            best_speaker = speaker_id
-    return best_speaker
-
-matching_results = {}
-for i, test_mfcc in enumerate(test_mfcc_features):
-    best_speaker = match_speaker(test_mfcc, vq_codebooks)  # match
-    matching_results[valid_test_files[i]] = best_speaker
+matching_results = dict(zip(valid_test_files, identify(test_mfcc_features, vq_codebooks)))  # match, all files at once
 for i, test_file in enumerate(valid_test_files):
     true_speaker = true_labels[i]
     predicted_speaker = matching_results[test_file]
@@ -357,64 +233,57 @@ twelve_test_files = [f for f in os.listdir(twelve_test_path) if f.startswith("Tw
 
 mfcc_features = {}
 labels = {}
-phrase_features = {"Zero": [], "Twelve": []}
+file_paths = {}
 
 def process_training_files(files, path, phrase): # phrase marked, for 0/12
-    for file in files:
+    mfcc_matrices = extract_mfcc_batch([os.path.join(path, file) for file in files], vad=USE_VAD, timings=decode_timings)
+    for file, mfcc_matrix in zip(files, mfcc_matrices):
         speaker_id = int(file.split(f"{phrase}_train")[-1].split(".wav")[0])
-        file_path = os.path.join(path, file)
-        mfcc_matrix = extract_mfcc(file_path)
         if speaker_id not in mfcc_features:
             mfcc_features[speaker_id] = []
             labels[speaker_id] = []
+            file_paths[speaker_id] = []
         mfcc_features[speaker_id].append(mfcc_matrix)
         labels[speaker_id].append(phrase)
-        phrase_features[phrase].append(mfcc_matrix) # append phrase feature. Phrases are labeled first.
+        file_paths[speaker_id].append(os.path.join(path, file))
 
 process_training_files(zero_train_files, zero_train_path, "Zero")
 process_training_files(twelve_train_files, twelve_train_path, "Twelve")
 
 # Train
-vq_codebooks = train_vq_codebook_per_speaker(mfcc_features, num_clusters=16)
-phrase_codebooks = train_vq_codebook_per_speaker(phrase_features, num_clusters=8)
+feature_store = open_feature_store(write_feature_store(os.path.join(STORE_DIR, "zero_twelve"), mfcc_features, phrases=labels, file_names=file_paths))
+vq_codebooks = train_vq_codebook_per_speaker(speaker_views(feature_store), num_clusters=16, batch_size=TRAIN_BATCH_SIZE, num_workers=TRAIN_WORKERS)
+phrase_codebooks = train_vq_codebook_per_speaker(phrase_views(feature_store), num_clusters=8, batch_size=TRAIN_BATCH_SIZE, num_workers=TRAIN_WORKERS)
 
 test_mfcc_features = []
 true_speaker_labels = []
 true_phrase_labels = []
 
 def process_test_files(files, path, phrase):
-    for file in files:
+    mfcc_matrices = extract_mfcc_batch([os.path.join(path, file) for file in files], vad=USE_VAD, timings=decode_timings)
+    for file, mfcc_matrix in zip(files, mfcc_matrices):
         speaker_id = int(file.split(f"{phrase}_test")[-1].split(".wav")[0])
-        file_path = os.path.join(path, file)
-        mfcc_matrix = extract_mfcc(file_path)
         test_mfcc_features.append(mfcc_matrix)
         true_speaker_labels.append(speaker_id)
         true_phrase_labels.append(phrase)
 
 process_test_files(zero_test_files, zero_test_path, "Zero")
 process_test_files(twelve_test_files, twelve_test_path, "Twelve")
+report_decode_timings(decode_timings) # where ingestion time went
+decode_timings.clear()
 
 # Perform speaker and phrase identification
-matching_results = {}
-phrase_classification_results = {}
-
-for i, test_mfcc in enumerate(test_mfcc_features):
-    best_speaker = match_speaker(test_mfcc, vq_codebooks)
-    best_phrase = match_speaker(test_mfcc, phrase_codebooks) #match_phrase, but can use same function, with same variable type
-    matching_results[i] = best_speaker
-    phrase_classification_results[i] = best_phrase
+# every test file against every codebook in one pass
+# speaker and phrase codebooks stacked: every test frame's distances are computed once for both decisions
+speaker_scores, phrase_scores = joint_distortions(test_mfcc_features, vq_codebooks, phrase_codebooks) # (test files x speakers / phrases), reused below
+matching_results = dict(enumerate(best_speakers(*speaker_scores)))
+phrase_classification_results = dict(enumerate(best_speakers(*phrase_scores))) #match_phrase, same decision rule
 
 # Calculate accuracy
-zero_correct = sum(1 for i in range(len(test_mfcc_features)) if phrase_classification_results[i] == "Zero" and true_phrase_labels[i] == "Zero")
-twelve_correct = sum(1 for i in range(len(test_mfcc_features)) if phrase_classification_results[i] == "Twelve" and true_phrase_labels[i] == "Twelve")
-speaker_correct = sum(1 for i in range(len(test_mfcc_features)) if matching_results[i] == true_speaker_labels[i])
-
-total_zero = sum(1 for label in true_phrase_labels if label == "Zero")
-total_twelve = sum(1 for label in true_phrase_labels if label == "Twelve")
-
-zero_accuracy = zero_correct / total_zero if total_zero > 0 else 0
-twelve_accuracy = twelve_correct / total_twelve if total_twelve > 0 else 0
-speaker_accuracy = speaker_correct / len(test_mfcc_features)
+joint_accuracy = joint_accuracies(list(matching_results.values()), list(phrase_classification_results.values()), true_speaker_labels, true_phrase_labels)
+zero_accuracy = joint_accuracy["per_phrase"].get("Zero", {"phrase": 0})["phrase"]
+twelve_accuracy = joint_accuracy["per_phrase"].get("Twelve", {"phrase": 0})["phrase"]
+speaker_accuracy = joint_accuracy["speaker"]
 
 print("Matching Results:")
 for i in range(len(test_mfcc_features)):
@@ -423,6 +292,80 @@ for i in range(len(test_mfcc_features)):
 print(f"Speaker accuracy: {speaker_accuracy:.2f}")
 print(f"Zero accuracy: {zero_accuracy:.2f}")
 print(f"Twelve accuracy: {twelve_accuracy:.2f}")
+print(f"Speaker and phrase both right: {joint_accuracy['combined']:.2f}")
+for phrase, rates in joint_accuracy["per_phrase"].items():
+    print(f"  {phrase} files: speaker {rates['speaker']:.2f}, phrase {rates['phrase']:.2f}, both {rates['combined']:.2f}")
+
+"""Score matrix analyses"""
+
+def print_score_report(scores, true_ids): # scores: (distortions, speaker_ids) from average_distortions, nothing is rescored
+    distortions, speaker_ids = scores
+    print("Top-k speaker accuracy: " + ", ".join(f"top-{k} {accuracy:.2f}" for k, accuracy in top_k_accuracy(distortions, speaker_ids, true_ids).items()))
+    ranks = true_ranks(distortions, speaker_ids, true_ids)
+    margins = decision_margins(distortions)
+    print(f"Median decision margin: correct {np.median(margins[ranks == 1]):.3f}, wrong {np.median(margins[ranks != 1]) if (ranks != 1).any() else float('nan'):.3f}")
+    confusion = confusion_matrix(distortions, speaker_ids, true_ids)
+    np.fill_diagonal(confusion, 0)
+    for true_index, predicted_index in zip(*np.nonzero(confusion)):
+        print(f"Speaker {speaker_ids[true_index]} taken for {speaker_ids[predicted_index]}: {confusion[true_index, predicted_index]} file(s)")
+
+if SCORE_REPORT:
+    print_score_report(speaker_scores, true_speaker_labels)
+
+"""Centroid index vs exact matching"""
+
+def print_index_report(test_mfccs, codebooks, true_ids): # KD-tree shortlists against exhaustive scoring
+    for row in index_report(test_mfccs, codebooks, true_ids):
+        method = "exact" if row["top_m"] is None else f"index top-{row['top_m']}, shortlist {row['shortlist']}"
+        print(f"{method}: agreement {row['agreement']:.2f}, accuracy {row['accuracy']:.2f}, {row['seconds'] * 1000:.1f} ms")
+
+if INDEX_REPORT:
+    print_index_report(test_mfcc_features, vq_codebooks, true_speaker_labels)
+
+"""Coarse-to-fine search"""
+
+def print_search_curve(test_mfccs, codebooks, true_ids): # summary codebooks shortlist, full codebooks decide
+    for row in hierarchy_curve(test_mfccs, codebooks, true_ids, shortlists=(1, 2, 4, 8)):
+        method = "exact" if row["shortlist"] is None else f"summary {row['summary_size']}, shortlist {row['shortlist']}"
+        print(f"{method}: accuracy {row['accuracy']:.2f}, agreement {row['agreement']:.2f}, {row['seconds'] * 1000 / len(test_mfccs):.2f} ms per file")
+
+if SEARCH_CURVE:
+    print_search_curve(test_mfcc_features, vq_codebooks, true_speaker_labels)
+
+"""Early termination"""
+
+def print_early_report(test_mfccs, codebooks, true_ids): # frame blocks until every rival is out of the running
+    for row in early_report(test_mfccs, codebooks, true_ids):
+        method = "all frames" if row["margin"] is None else f"margin {row['margin']}"
+        print(f"{method}: accuracy {row['accuracy']:.2f}, agreement {row['agreement']:.2f}, frames used {row['frames_used']:.2f}, "
+              f"{row['seconds'] * 1000 / len(test_mfccs):.2f} ms per file")
+
+if EARLY_REPORT:
+    print_early_report(test_mfcc_features, vq_codebooks, true_speaker_labels)
+
+"""Frame decimation"""
+
+def print_decimation_sweep(test_mfccs, codebooks, true_ids): # adjacent 16 ms frames are redundant, how many can be skipped
+    for row in decimation_sweep(test_mfccs, codebooks, true_ids, factors=(2, 4, 8)):
+        method = "every frame" if row["method"] is None else f"{row['method']}, 1 in {row['factor']}"
+        print(f"{method}: accuracy {row['accuracy']:.2f}, agreement {row['agreement']:.2f}, {row['frames_per_second'] / 1000:.0f}k frames/s")
+
+if DECIMATION_SWEEP:
+    print_decimation_sweep(test_mfcc_features, vq_codebooks, true_speaker_labels)
+
+"""Streaming identification"""
+
+def print_stream_replay(test_paths, codebooks, true_ids, offline_results): # concurrent file replays standing in for live microphones
+    finals, latencies = run_replay(test_paths, codebooks, realtime=True, vad=USE_VAD) # same frames as the offline scores
+    speakers = [final["speaker"] if final else None for final in finals]
+    streaming_accuracy = sum(1 for speaker, true_id in zip(speakers, true_ids) if speaker == true_id) / len(true_ids)
+    agreement = sum(1 for i, speaker in enumerate(speakers) if speaker == offline_results[i]) / len(speakers)
+    print(f"Streaming accuracy: {streaming_accuracy:.2f}, agreement with offline: {agreement:.2f}, {len(test_paths)} concurrent streams")
+    print("Chunk latency: " + ", ".join(f"{name} {ms:.2f} ms" for name, ms in latencies["all"].items()))
+
+if STREAM_REPLAY:
+    print_stream_replay([os.path.join(zero_test_path, f) for f in zero_test_files] + [os.path.join(twelve_test_path, f) for f in twelve_test_files],
+                        vq_codebooks, true_speaker_labels, matching_results)
 
 """25 Five Eleven"""
 
@@ -436,69 +379,56 @@ five_test_files = [f for f in os.listdir(five_test_path) if f.endswith(".wav")]
 eleven_train_files = [f for f in os.listdir(eleven_train_path) if f.endswith(".wav")]
 eleven_test_files = [f for f in os.listdir(eleven_test_path) if f.endswith(".wav")]
 
-def extract_mfcc(file_path, sr=16000, n_mfcc=26, n_fft=1024, hop_length=256):
-    signal, _ = librosa.load(file_path, sr=sr)
-    mfccs = librosa.feature.mfcc(y=signal, sr=sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length)
-    return mfccs.T
-
 mfcc_features = {}
 labels = {}
-phrase_features = {"Five": [], "Eleven": []}
+file_paths = {}
 
 def process_training_files(files, path, phrase):
-    for file in files:
+    mfcc_matrices = extract_mfcc_batch([os.path.join(path, file) for file in files], vad=USE_VAD, timings=decode_timings)
+    for file, mfcc_matrix in zip(files, mfcc_matrices):
         speaker_id = int(file.split("s")[-1].split(".wav")[0])
-        file_path = os.path.join(path, file)
-        mfcc_matrix = extract_mfcc(file_path)
         if speaker_id not in mfcc_features:
             mfcc_features[speaker_id] = []
             labels[speaker_id] = []
+            file_paths[speaker_id] = []
         mfcc_features[speaker_id].append(mfcc_matrix)
         labels[speaker_id].append(phrase)
-        phrase_features[phrase].append(mfcc_matrix)
+        file_paths[speaker_id].append(os.path.join(path, file))
 
 process_training_files(five_train_files, five_train_path, "Five")
 process_training_files(eleven_train_files, eleven_train_path, "Eleven")
 
-vq_codebooks = train_vq_codebook_per_speaker(mfcc_features, num_clusters=16)
-phrase_codebooks = train_vq_codebook_per_speaker(phrase_features, num_clusters=8)
+feature_store = open_feature_store(write_feature_store(os.path.join(STORE_DIR, "five_eleven"), mfcc_features, phrases=labels, file_names=file_paths))
+vq_codebooks = train_vq_codebook_per_speaker(speaker_views(feature_store), num_clusters=16, batch_size=TRAIN_BATCH_SIZE, num_workers=TRAIN_WORKERS)
+phrase_codebooks = train_vq_codebook_per_speaker(phrase_views(feature_store), num_clusters=8, batch_size=TRAIN_BATCH_SIZE, num_workers=TRAIN_WORKERS)
 
 test_mfcc_features = []
 true_speaker_labels = []
 true_phrase_labels = []
 
 def process_test_files(files, path, phrase):
-    for file in files:
+    mfcc_matrices = extract_mfcc_batch([os.path.join(path, file) for file in files], vad=USE_VAD, timings=decode_timings)
+    for file, mfcc_matrix in zip(files, mfcc_matrices):
         speaker_id = int(file.split("s")[-1].split(".wav")[0])
-        file_path = os.path.join(path, file)
-        mfcc_matrix = extract_mfcc(file_path)
         test_mfcc_features.append(mfcc_matrix)
         true_speaker_labels.append(speaker_id)
         true_phrase_labels.append(phrase)
 
 process_test_files(five_test_files, five_test_path, "Five")
 process_test_files(eleven_test_files, eleven_test_path, "Eleven")
+report_decode_timings(decode_timings) # where ingestion time went
+decode_timings.clear()
 
-matching_results = {}
-phrase_classification_results = {}
-
-for i, test_mfcc in enumerate(test_mfcc_features):
-    best_speaker = match_speaker(test_mfcc, vq_codebooks)
-    best_phrase = match_speaker(test_mfcc, phrase_codebooks)
-    matching_results[i] = best_speaker
-    phrase_classification_results[i] = best_phrase
+# speaker and phrase codebooks stacked: every test frame's distances are computed once for both decisions
+speaker_scores, phrase_scores = joint_distortions(test_mfcc_features, vq_codebooks, phrase_codebooks) # (test files x speakers / phrases), reused below
+matching_results = dict(enumerate(best_speakers(*speaker_scores)))
+phrase_classification_results = dict(enumerate(best_speakers(*phrase_scores))) #match_phrase, same decision rule
 
 # Accuracy
-five_correct = sum(1 for i in range(len(test_mfcc_features)) if phrase_classification_results[i] == "Five" and true_phrase_labels[i] == "Five")
-eleven_correct = sum(1 for i in range(len(test_mfcc_features)) if phrase_classification_results[i] == "Eleven" and true_phrase_labels[i] == "Eleven")
-speaker_correct = sum(1 for i in range(len(test_mfcc_features)) if matching_results[i] == true_speaker_labels[i])
-
-total_five = sum(1 for label in true_phrase_labels if label == "Five")
-total_eleven = sum(1 for label in true_phrase_labels if label == "Eleven")
-
-five_accuracy = five_correct / total_five if total_five > 0 else 0
-eleven_accuracy = eleven_correct / total_eleven if total_eleven > 0 else 0
-speaker_accuracy = speaker_correct / len(test_mfcc_features)
+joint_accuracy = joint_accuracies(list(matching_results.values()), list(phrase_classification_results.values()), true_speaker_labels, true_phrase_labels)
+five_accuracy = joint_accuracy["per_phrase"].get("Five", {"phrase": 0})["phrase"]
+eleven_accuracy = joint_accuracy["per_phrase"].get("Eleven", {"phrase": 0})["phrase"]
+speaker_accuracy = joint_accuracy["speaker"]
 
 print("Matching Results:")
 for i in range(len(test_mfcc_features)):
@@ -506,4 +436,58 @@ for i in range(len(test_mfcc_features)):
 
 print(f"Speaker accuracy: {speaker_accuracy:.2f}")
 print(f"Five accuracy: {five_accuracy:.2f}")
-print(f"Eleven accuracy: {eleven_accuracy:.2f}")
\ No newline at end of file
+print(f"Eleven accuracy: {eleven_accuracy:.2f}")
+print(f"Speaker and phrase both right: {joint_accuracy['combined']:.2f}")
+for phrase, rates in joint_accuracy["per_phrase"].items():
+    print(f"  {phrase} files: speaker {rates['speaker']:.2f}, phrase {rates['phrase']:.2f}, both {rates['combined']:.2f}")
+
+if SCORE_REPORT:
+    print_score_report(speaker_scores, true_speaker_labels)
+if INDEX_REPORT:
+    print_index_report(test_mfcc_features, vq_codebooks, true_speaker_labels)
+if SEARCH_CURVE:
+    print_search_curve(test_mfcc_features, vq_codebooks, true_speaker_labels)
+if EARLY_REPORT:
+    print_early_report(test_mfcc_features, vq_codebooks, true_speaker_labels)
+if DECIMATION_SWEEP:
+    print_decimation_sweep(test_mfcc_features, vq_codebooks, true_speaker_labels)
+if STREAM_REPLAY:
+    print_stream_replay([os.path.join(five_test_path, f) for f in five_test_files] + [os.path.join(eleven_test_path, f) for f in eleven_test_files],
+                        vq_codebooks, true_speaker_labels, matching_results)
+
+"""float32 vs float64 decisions, VAD"""
+
+def files_by_speaker(file_sets, marker): # [(files, path)] -> speaker -> paths, ids parsed like process_training_files
+    speaker_files = {}
+    for files, path in file_sets:
+        for file in files:
+            speaker_id = int(file.split(marker)[-1].split(".wav")[0])
+            speaker_files.setdefault(speaker_id, []).append(os.path.join(path, file))
+    return speaker_files
+
+def test_set(file_sets, marker): # [(files, path)] -> (paths, true speaker ids)
+    paths = [os.path.join(path, file) for files, path in file_sets for file in files]
+    return paths, [int(os.path.basename(path).split(marker)[-1].split(".wav")[0]) for path in paths]
+
+if VALIDATE_DTYPE or VAD_REPORT:
+    data_sets = { # name -> (train files per speaker, (test paths, true ids), normalize + lowpass first)
+        "Original": ({i + 1: [os.path.join(DRIVE_PATH, file)] for i, file in enumerate(audio_files)}, test_set([(test_audio_files, test_drive_path)], "s"), True),
+        "24 Zero/Twelve": (files_by_speaker([(zero_train_files, zero_train_path), (twelve_train_files, twelve_train_path)], "_train"),
+                           test_set([(zero_test_files, zero_test_path), (twelve_test_files, twelve_test_path)], "_test"), False),
+        "25 Five/Eleven": (files_by_speaker([(five_train_files, five_train_path), (eleven_train_files, eleven_train_path)], "s"),
+                           test_set([(five_test_files, five_test_path), (eleven_test_files, eleven_test_path)], "s"), False),
+    }
+
+if VALIDATE_DTYPE:
+    for name, (train_files, (test_files, _), preprocess) in data_sets.items():
+        check = validate_dtype(train_files, test_files, preprocess=preprocess)
+        print(f"{name}: float32 agrees with float64 on {check['agreement']:.2%} of decisions, max relative distortion diff {check['max_rel_distortion_diff']:.1e}")
+        for test_file, expected, got in check["mismatches"]:
+            print(f"  {os.path.basename(test_file)}: float64 {expected}, float32 {got}")
+
+if VAD_REPORT:
+    for name, (train_files, (test_files, true_ids), preprocess) in data_sets.items():
+        without_vad, with_vad = vad_report(train_files, test_files, true_ids, preprocess=preprocess)
+        speedup = ", ".join(f"{stage} {ratio:.2f}x" for stage, ratio in with_vad["speedup"].items())
+        print(f"{name}: VAD removes {with_vad['frames_removed']:.1%} of frames; speed-up {speedup}; "
+              f"accuracy {without_vad['accuracy']:.2f} -> {with_vad['accuracy']:.2f} ({with_vad['accuracy_change']:+.2f})")
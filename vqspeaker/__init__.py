@@ -0,0 +1,31 @@
+"""VQ speaker recognition pipeline (EEC 201 final project) as a library.
+
+Importing the package has no side effects and only pulls in numpy;
+librosa, scipy, soundfile, matplotlib and umap are imported by the
+functions that need them. Plots live in ``vqspeaker.plotting``.
+"""
+
+from .audio import (COMPUTE_DTYPE, design_filter, fast_load, filter_signals, load_audio, lowpass_filter, normalize_audio, notch_filter, pad_signals,
+                    report_decode_timings, resample, resolve_dtype, stream_blocks, stream_stats)
+from .cache import cache_lookup, cache_store, cached_features, evict_cache
+from .decimation import METHODS, decimate_frames, decimation_sweep
+from .early import early_identify, early_report
+from .features import (compute_mfcc, compute_mfcc_batch, compute_sample_time, extract_mfcc, extract_mfcc_batch, featurize_audio, featurize_files,
+                       featurize_params, get_mfcc_bases, mfcc_params, open_mfcc_stream, push_samples, stream_mfcc)
+from .hierarchy import build_hierarchy, coarse_to_fine_identify, hierarchy_curve, summary_codebook
+from .index import build_centroid_index, index_distortions, index_identify, index_report, index_votes, query_index
+from .joint import joint_accuracies, joint_distortions, joint_identify
+from .matching import (as_stack, average_distortions, best_speakers, identify, match_speaker, min_distances, report_agreement, rescore_candidates,
+                       score_weights, select_speakers, select_weights, speaker_distortion, squared_norms, stack_codebooks, utterance_groups)
+from .model import MODEL_VERSION, check_params, load_model, model_codebooks, model_stack, normalize_features, save_model
+from .parallel import attach_array, cap_blas_threads, chunked, mapped_region, parallel_map, share_arrays
+from .registry import add_codebook, enroll, open_registry, registry_codebooks, registry_stack, remove
+from .scoring import confusion_matrix, decision_margins, top_k, top_k_accuracy, true_ranks
+from .store import file_view, open_feature_store, phrase_views, speaker_views, store_labels, write_feature_store
+from .streaming import (latency_percentiles, open_stream, replay_file, replay_files, run_replay, service_latencies, start_service, stream_decision,
+                        stream_weights, update_stream)
+from .sweep import notch_sweep
+from .vad import VAD_PARAMS, frame_statistics, open_vad_stream, speech_mask, stream_speech
+from .validation import featurize_paths, identify_with_dtype, vad_report, validate_dtype
+from .vq import (cell_sums, frame_batches, lbg_algorithm, lbg_kmeans, lbg_train, lloyd, minibatch_train, nearest_centroids, normalize_mfcc,
+                 train_codebook, train_vq_codebook_per_speaker)
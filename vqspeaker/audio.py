@@ -0,0 +1,137 @@
+"""Audio decoding, normalization and filtering."""
+
+import os
+import time
+from math import gcd
+
+import numpy as np
+
+from .cache import cached_features
+
+COMPUTE_DTYPE = np.float32 # every stage runs in this dtype; means, variances and distortion sums accumulate in float64
+CACHE_PCM = False # also cache resampled PCM, worth it when the native rate is not 16 kHz
+BLOCK_SIZE = 65536 # samples per streaming read, bounds memory regardless of file length
+filter_designs = {} # (type, params, sr) -> sos
+
+def resolve_dtype(dtype=None):
+    return np.dtype(COMPUTE_DTYPE if dtype is None else dtype)
+
+def load_audio(file_name, base_path, sr=16000, timings=None): # load audio from selected path
+    file_path = os.path.join(base_path, file_name)
+    if not os.path.exists(file_path):
+        print(f"file{file_path}non-exist！")
+        return None, None
+    signal, sample_rate = fast_load(file_path, sr=sr, timings=timings)
+    return signal, sample_rate
+
+def resample(signal, native_sr, sr, dtype=None): # polyphase, far cheaper than librosa's default soxr_hq
+    import scipy.signal
+    g = gcd(int(native_sr), int(sr))
+    return scipy.signal.resample_poly(signal, sr // g, native_sr // g).astype(resolve_dtype(dtype), copy=False)
+
+def fast_load(file_path, sr=16000, cache_pcm=None, dtype=None, timings=None): # drop-in for librosa.load(file_path, sr=sr)
+    # timings: the caller's list, gets one dict per call (decode and resample seconds, native rate); None records nothing
+    import soundfile as sf
+    cache_pcm = CACHE_PCM if cache_pcm is None else cache_pcm
+    dtype = resolve_dtype(dtype)
+    timing = {"file": file_path, "decode_s": 0.0, "resample_s": 0.0}
+    def decode():
+        start = time.perf_counter()
+        try:
+            signal, native_sr = sf.read(file_path, dtype=dtype.name, always_2d=True)
+            signal = signal.mean(axis=1, dtype=dtype) # to mono, as librosa.load
+        except RuntimeError: # format libsndfile can't read
+            import librosa
+            signal, native_sr = librosa.load(file_path, sr=None, dtype=dtype)
+        timing["decode_s"] = time.perf_counter() - start
+        timing["native_sr"] = native_sr
+        if native_sr == sr: # already at target rate, no resampling
+            return signal
+        start = time.perf_counter()
+        signal = resample(signal, native_sr, sr, dtype)
+        timing["resample_s"] = time.perf_counter() - start
+        return signal
+    signal = cached_features(file_path, {"sr": sr, "pcm": True, "resampler": "polyphase", "dtype": dtype.name}, decode) if cache_pcm else decode()
+    if timings is not None:
+        timings.append(timing)
+    return signal, sr
+
+def report_decode_timings(timings): # timings collected by fast_load / extract_mfcc_batch
+    for t in timings:
+        if "native_sr" not in t:
+            print(f"{os.path.basename(t['file'])}: PCM cache hit")
+            continue
+        print(f"{os.path.basename(t['file'])}: {t['native_sr']} Hz, decode {t['decode_s'] * 1000:.1f} ms, resample {t['resample_s'] * 1000:.1f} ms")
+    if timings:
+        decode_total = sum(t["decode_s"] for t in timings)
+        resample_total = sum(t["resample_s"] for t in timings)
+        print(f"{len(timings)} files: decode {decode_total:.2f} s, resample {resample_total:.2f} s")
+
+def normalize_audio(signal, dtype=None):
+    mean, std = np.mean(signal, dtype=np.float64), np.std(signal, dtype=np.float64) # float64 sums, long signals
+    return ((signal - mean) / std).astype(resolve_dtype(dtype), copy=False) # np.ndarray
+
+def design_filter(kind, sr, **params): # memoized per (type, params, sr), second-order sections
+    key = (kind, tuple(sorted(params.items())), sr)
+    if key not in filter_designs:
+        import scipy.signal
+        if kind == "lowpass":
+            nyquist = 0.5 * sr
+            sos = scipy.signal.butter(params["order"], params["cutoff"] / nyquist, btype='low', output='sos')
+        elif kind == "notch":
+            b, a = scipy.signal.iirnotch(params["freq"], params["quality_factor"], sr)
+            sos = scipy.signal.tf2sos(b, a)
+        else:
+            raise ValueError(f"unknown filter type: {kind}")
+        filter_designs[key] = sos
+    return filter_designs[key]
+
+def lowpass_filter(signal, sr, cutoff=3000, order=5, axis=-1): # signal: 1-D, or 2-D batch of equal-length signals
+    import scipy.signal
+    sos = design_filter("lowpass", sr, cutoff=cutoff, order=order).astype(signal.dtype, copy=False) # keeps float32 input in float32
+    filtered_signal = scipy.signal.sosfiltfilt(sos, signal, axis=axis)
+    return filtered_signal # np.ndarray
+
+def notch_filter(signal, sr, freq, quality_factor=42, axis=-1):
+    import scipy.signal
+    sos = design_filter("notch", sr, freq=freq, quality_factor=quality_factor).astype(signal.dtype, copy=False)
+    return scipy.signal.sosfiltfilt(sos, signal, axis=axis)
+
+def pad_signals(signals): # ragged list -> zero-padded (n, max_len) batch + lengths
+    lengths = np.array([len(signal) for signal in signals])
+    batch = np.zeros((len(signals), lengths.max()), dtype=np.result_type(*signals))
+    for i, signal in enumerate(signals):
+        batch[i, :len(signal)] = signal
+    return batch, lengths
+
+def filter_signals(signals, filter_func, *args, **kwargs): # e.g. filter_signals(signals, lowpass_filter, sr): one call per distinct length
+    # signals are filtered at their own length: a zero-padded tail would ring back through a short signal in the backward pass
+    by_length = {}
+    for i, signal in enumerate(signals):
+        by_length.setdefault(len(signal), []).append(i)
+    filtered = [None] * len(signals)
+    for indices in by_length.values():
+        batch = filter_func(np.stack([signals[i] for i in indices]), *args, axis=1, **kwargs)
+        for i, row in zip(indices, batch):
+            filtered[i] = row
+    return filtered
+
+def stream_blocks(file_path, sr=16000, block_size=BLOCK_SIZE): # mono float32 blocks at sr, soxr streams float32 only
+    import soundfile as sf
+    import soxr
+    native_sr = sf.info(file_path).samplerate
+    resampler = soxr.ResampleStream(native_sr, sr, 1, dtype="float32") if native_sr != sr else None # keeps state across blocks
+    for block in sf.blocks(file_path, blocksize=block_size, dtype="float32", always_2d=True):
+        block = block.mean(axis=1) # to mono, as librosa.load
+        yield resampler.resample_chunk(block) if resampler else block
+    if resampler:
+        yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True) # flush
+
+def stream_stats(file_path, sr=16000, block_size=BLOCK_SIZE): # mean/std for normalize_audio in one extra pass
+    count, total, total_sq = 0, 0.0, 0.0
+    for block in stream_blocks(file_path, sr, block_size):
+        count += block.size
+        total += np.sum(block, dtype=np.float64)
+        total_sq += np.sum(np.square(block, dtype=np.float64))
+    mean = total / count
+    return mean, np.sqrt(max(total_sq / count - mean ** 2, 0.0))
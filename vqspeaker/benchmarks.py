@@ -0,0 +1,217 @@
+"""Timing comparisons against the previous implementations: python -m vqspeaker.benchmarks [name ...]"""
+
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from .decimation import decimation_sweep
+from .early import early_report
+from .features import compute_mfcc, compute_mfcc_batch, mfcc_params
+from .hierarchy import hierarchy_curve
+from .index import index_report
+from .matching import average_distortions, identify, speaker_distortion
+from .joint import joint_distortions
+from .model import load_model, save_model
+from .parallel import NUM_WORKERS
+from .scoring import decision_margins, top_k, true_ranks
+from .vad import speech_mask
+from .vq import lbg_kmeans, lbg_train, minibatch_train, nearest_centroids, train_vq_codebook_per_speaker
+
+def best_time(func, *args, repeats=3): # best-of-N wall time and the last result
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func(*args)
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+def synthetic_frames(n_frames, dim=26, n_modes=24, seed=0): # MFCC-like mixture: a few dozen clusters of uneven spread
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(0, 20, (n_modes, dim))
+    modes = rng.integers(0, n_modes, n_frames)
+    return (centers[modes] + rng.normal(0, 1, (n_frames, dim)) * rng.uniform(1, 6, n_modes)[modes, None]).astype(np.float32)
+
+def synthetic_speakers(n_speakers, n_utterances=40, frames_per_utterance=300, num_clusters=16, dim=26, spread=0.6, seed=0):
+    # codebooks + test utterances drawn around them; coefficient spread decays like MFCCs, utterance i belongs to speaker i
+    # spread: frame noise relative to the centroid scatter, larger values make speakers harder to tell apart
+    rng = np.random.default_rng(seed)
+    scale = 20 / (1 + np.arange(dim)) ** 0.7
+    codebooks = {speaker_id: (rng.normal(size=(num_clusters, dim)) * scale).astype(np.float32) for speaker_id in range(n_speakers)}
+    utterances = [(codebooks[i][rng.integers(0, num_clusters, frames_per_utterance)] + spread * scale * rng.normal(size=(frames_per_utterance, dim))).astype(np.float32)
+                  for i in range(min(n_utterances, n_speakers))]
+    return codebooks, utterances, list(range(len(utterances)))
+
+def synthetic_recordings(n_signals, seconds=4.0, silence=0.4, sr=16000, seed=0): # voiced bursts between pauses of faint noise
+    # silence: fraction of each signal that is pause; bursts are a decaying harmonic series with a little breath noise
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sr)) / sr
+    signals = []
+    for _ in range(n_signals):
+        f0 = rng.uniform(90, 250)
+        voiced = sum(np.sin(2 * np.pi * f0 * k * t + rng.uniform(0, 6)) / k for k in range(1, 30) if f0 * k < sr / 2)
+        pauses = np.repeat(rng.random(int(seconds * 4)) < silence, len(t) // int(seconds * 4) + 1)[:len(t)] # 250 ms segments
+        signals.append(np.where(pauses, 0.0, 0.3 * voiced) + 1e-3 * rng.normal(size=len(t)).astype(np.float32))
+    return [signal.astype(np.float32) for signal in signals]
+
+def benchmark_lbg(frame_counts=(2000, 10000, 50000), num_clusters=16):
+    print(f"LBG, {num_clusters} centroids: kmeans restarts (old) vs split-and-refine Lloyd (new)")
+    for n_frames in frame_counts:
+        features = synthetic_frames(n_frames)
+        old_time, old_codebook = best_time(lbg_kmeans, features, num_clusters)
+        new_time, (new_codebook, levels) = best_time(lbg_train, features, num_clusters)
+        old_distortion = np.mean(np.sqrt(nearest_centroids(features.astype(np.float64), old_codebook)[1]))
+        print(f"  {n_frames:>6} frames: old {old_time * 1000:8.1f} ms (distortion {old_distortion:.3f}), "
+              f"new {new_time * 1000:7.1f} ms (distortion {levels[-1][1]:.3f}, {levels[-1][1] / old_distortion - 1:+.1%}), speedup {old_time / new_time:.1f}x")
+        print("         per level: " + ", ".join(f"{size}: {distortion:.3f} ({iterations} it)" for size, distortion, iterations in levels))
+
+def benchmark_minibatch(n_frames=500000, num_clusters=16, batch_size=4096, epochs=3):
+    print(f"{n_frames} frames, {num_clusters} centroids: full-batch LBG in RAM vs mini-batch from a memmap ({batch_size}-frame batches)")
+    features = synthetic_frames(n_frames)
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "frames.npy")
+        np.save(path, features)
+        frames = np.load(path, mmap_mode="r")
+        full_time, (codebook, _) = best_time(lbg_train, features, num_clusters, repeats=1)
+        print(f"  full batch: {full_time:6.2f} s, distortion {np.mean(np.sqrt(nearest_centroids(features, codebook)[1])):.3f}")
+        for refine in (0, 2):
+            batch_time, (codebook, history) = best_time(minibatch_train, frames, num_clusters, batch_size, epochs, 0.01, refine, repeats=1)
+            print(f"  mini-batch, refine={refine}: {batch_time:6.2f} s ({batch_time / len(history):.2f} s per pass), "
+                  f"distortion {np.mean(np.sqrt(nearest_centroids(features, codebook)[1])):.3f}")
+        del frames # release the memmap before the directory goes
+
+def benchmark_parallel(n_speakers=64, frames_per_speaker=20000, num_clusters=16):
+    print(f"{n_speakers} speakers x {frames_per_speaker} frames, {num_clusters} centroids, {NUM_WORKERS} cores")
+    features = {speaker_id: synthetic_frames(frames_per_speaker, seed=speaker_id) for speaker_id in range(n_speakers)}
+    serial_time, serial = best_time(train_vq_codebook_per_speaker, features, num_clusters, repeats=1)
+    print(f"  1 worker: {serial_time:6.2f} s")
+    for num_workers in sorted({2, 4, NUM_WORKERS} - {1}):
+        pool_time, codebooks = best_time(lambda: train_vq_codebook_per_speaker(features, num_clusters, num_workers=num_workers), repeats=1)
+        same = all(np.array_equal(serial[key], codebooks[key]) for key in serial)
+        print(f"  {num_workers} workers: {pool_time:6.2f} s, speedup {serial_time / pool_time:.2f}x, identical codebooks: {same}")
+
+def benchmark_model(n_speakers=5000, num_clusters=16, dim=26):
+    print(f"model file with {n_speakers} speakers x {num_clusters} centroids")
+    rng = np.random.default_rng(0)
+    codebooks = {speaker_id: rng.normal(size=(num_clusters, dim)).astype(np.float32) for speaker_id in range(n_speakers)}
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "model")
+        save_time, _ = best_time(save_model, path, codebooks, mfcc_params(), repeats=1)
+        load_time, model = best_time(load_model, path, mfcc_params())
+        print(f"  save {save_time * 1000:.1f} ms, load {load_time * 1000:.2f} ms, {os.path.getsize(path + '.npy') / 1e6:.1f} MB of centroids")
+        del model
+
+def cdist_distortion(test_mfcc, codebook): # previous speaker_distortion
+    from scipy.spatial.distance import cdist
+    return np.mean(np.min(cdist(test_mfcc, codebook, metric="euclidean"), axis=1))
+
+def benchmark_distortion(frame_counts=(1000, 10000, 100000), codebook_sizes=(16, 64, 256)):
+    print("avg min distortion, Mframes/s: cdist (old) vs GEMM kernel in float64 and float32")
+    for n_frames in frame_counts:
+        frames = synthetic_frames(n_frames)
+        for size in codebook_sizes:
+            codebook = synthetic_frames(size, seed=1)
+            old_time, _ = best_time(cdist_distortion, frames, codebook)
+            new64_time, _ = best_time(speaker_distortion, frames.astype(np.float64), codebook.astype(np.float64))
+            new32_time, _ = best_time(speaker_distortion, frames, codebook)
+            rates = [n_frames / t / 1e6 for t in (old_time, new64_time, new32_time)]
+            print(f"  {n_frames:>6} frames x {size:>3} centroids: cdist {rates[0]:6.2f}, float64 {rates[1]:6.2f}, float32 {rates[2]:6.2f} "
+                  f"({old_time / new32_time:.1f}x)")
+
+def loop_match(test_mfcc, codebooks): # previous match_speaker: one cdist per speaker
+    distortions = {speaker_id: cdist_distortion(test_mfcc, codebook) for speaker_id, codebook in codebooks.items()}
+    return min(distortions, key=distortions.get)
+
+def benchmark_identify(speaker_counts=(10, 100, 1000, 5000), n_utterances=40, frames_per_utterance=300, num_clusters=16):
+    print(f"identification of {n_utterances} utterances x {frames_per_utterance} frames: per-speaker cdist loop (old) vs stacked codebooks")
+    rng = np.random.default_rng(0)
+    utterances = [synthetic_frames(frames_per_utterance, seed=i) for i in range(n_utterances)]
+    for n_speakers in speaker_counts:
+        codebooks = {speaker_id: rng.normal(0, 20, (num_clusters, 26)).astype(np.float32) for speaker_id in range(n_speakers)}
+        sample = utterances[:max(1, n_utterances * 10 // n_speakers)] # old loop on a subset, scaled up
+        loop_time, old = best_time(lambda: [loop_match(test_mfcc, codebooks) for test_mfcc in sample], repeats=1)
+        loop_time *= n_utterances / len(sample)
+        stacked_time, new = best_time(identify, utterances, codebooks)
+        print(f"  {n_speakers:>5} speakers: loop {loop_time * 1000:9.1f} ms, stacked {stacked_time * 1000:7.1f} ms "
+              f"({loop_time / stacked_time:.0f}x), same decisions: {old == new[:len(sample)]}")
+
+def benchmark_index(speaker_counts=(100, 1000, 5000)):
+    print("centroid index (KD-tree in 8 principal components) vs exact identification, 40 utterances x 300 frames")
+    for n_speakers in speaker_counts:
+        codebooks, utterances, true_ids = synthetic_speakers(n_speakers)
+        for row in index_report(utterances, codebooks, true_ids):
+            method = "exact" if row["top_m"] is None else f"top-{row['top_m']:<2} shortlist {row['shortlist']}"
+            print(f"  {n_speakers:>5} speakers, {method:<20}: agreement {row['agreement']:.3f}, {row['seconds'] * 1000:7.1f} ms")
+
+def benchmark_hierarchy(speaker_counts=(100, 1000, 5000)):
+    print("coarse-to-fine search (summary codebooks shortlist, 16-centroid rescoring) vs exact, 40 utterances x 300 frames")
+    for n_speakers in speaker_counts:
+        codebooks, utterances, true_ids = synthetic_speakers(n_speakers)
+        for row in hierarchy_curve(utterances, codebooks, true_ids):
+            method = "exact" if row["shortlist"] is None else f"summary {row['summary_size']}, shortlist {row['shortlist']}"
+            print(f"  {n_speakers:>5} speakers, {method:<22}: agreement {row['agreement']:.3f}, {row['seconds'] * 1000:7.1f} ms")
+
+def benchmark_early(spreads=(1.5, 2.5), n_speakers=100, frames_per_utterance=1000):
+    print(f"early termination (32-frame blocks, margin in standard errors) vs full scoring, {n_speakers} speakers, 40 utterances x {frames_per_utterance} frames")
+    for spread in spreads:
+        codebooks, utterances, true_ids = synthetic_speakers(n_speakers, frames_per_utterance=frames_per_utterance, spread=spread)
+        for row in early_report(utterances, codebooks, true_ids):
+            method = "full" if row["margin"] is None else f"margin {row['margin']}"
+            print(f"  spread {spread}, {method:<10}: frames used {row['frames_used']:.3f}, agreement {row['agreement']:.3f}, {row['seconds'] * 1000:7.1f} ms")
+
+def benchmark_scores(n_speakers=1000, n_utterances=400, frame_limits=(1 << 12, 1 << 14, 1 << 16, 1 << 20)):
+    print(f"score matrix ({n_utterances} utterances x {n_speakers} speakers, 300 frames each) by frames stacked per pass, then derived analyses")
+    codebooks, utterances, true_ids = synthetic_speakers(n_speakers, n_utterances)
+    for max_frames in frame_limits:
+        elapsed, (distortions, speaker_ids) = best_time(average_distortions, utterances, codebooks, max_frames)
+        print(f"  max_frames {max_frames:>7}: {elapsed * 1000:7.1f} ms")
+    elapsed, _ = best_time(lambda: (top_k(distortions, speaker_ids, 5), true_ranks(distortions, speaker_ids, true_ids), decision_margins(distortions)))
+    print(f"  top-5, ranks and margins from the matrix: {elapsed * 1000:.1f} ms")
+
+def benchmark_mfcc(n_signals=200, worker_counts=(1, NUM_WORKERS)):
+    print(f"MFCC: compute_mfcc per signal (librosa, old) vs compute_mfcc_batch, {n_signals} signals x 1-3 s, {os.cpu_count()} cores")
+    rng = np.random.default_rng(0)
+    signals = [(0.1 * rng.normal(size=int(rng.uniform(1, 3) * 16000))).astype(np.float32) for _ in range(n_signals)]
+    loop_time, expected = best_time(lambda: [compute_mfcc(signal, 16000) for signal in signals])
+    print(f"  librosa loop: {loop_time * 1000:6.1f} ms")
+    for workers in dict.fromkeys(worker_counts):
+        batch_time, mfccs = best_time(lambda: compute_mfcc_batch(signals, 16000, workers=workers))
+        error = max(np.abs(m - e).max() for m, e in zip(mfccs, expected))
+        print(f"  batch, {workers} FFT thread(s): {batch_time * 1000:6.1f} ms ({loop_time / batch_time:.2f}x), max |difference| {error:.1e}")
+
+def benchmark_vad(n_signals=100, silences=(0.2, 0.4, 0.6)):
+    print(f"VAD front end: speech_mask + MFCC of speech frames vs MFCC of every frame, {n_signals} signals x 4 s")
+    for silence in silences:
+        signals = synthetic_recordings(n_signals, silence=silence)
+        full_time, full = best_time(compute_mfcc_batch, signals, 16000)
+        vad_time, kept = best_time(lambda: compute_mfcc_batch(signals, 16000, masks=[speech_mask(signal) for signal in signals]))
+        removed = 1 - sum(m.shape[1] for m in kept) / sum(m.shape[1] for m in full)
+        print(f"  {silence:.0%} pauses: {removed:.1%} of frames removed, all frames {full_time * 1000:6.1f} ms, "
+              f"VAD {vad_time * 1000:6.1f} ms ({full_time / vad_time:.2f}x); training and scoring shrink with the frame count")
+
+def benchmark_decimation(n_speakers=200, frames_per_utterance=1000, spread=1.5):
+    print(f"frame decimation vs every frame, {n_speakers} speakers, 40 utterances x {frames_per_utterance} frames (independent frames, no temporal redundancy)")
+    codebooks, utterances, true_ids = synthetic_speakers(n_speakers, frames_per_utterance=frames_per_utterance, spread=spread)
+    for row in decimation_sweep(utterances, codebooks, true_ids):
+        method = "every frame" if row["method"] is None else f"{row['method']} /{row['factor']}"
+        print(f"  {method:<12}: agreement {row['agreement']:.3f}, accuracy {row['accuracy']:.3f}, {row['frames_per_second'] / 1e6:5.2f} M frames/s")
+
+def benchmark_joint(speaker_counts=(20, 200, 2000), n_phrases=2):
+    print(f"joint speaker + {n_phrases}-phrase scoring in one stacked pass vs two identify passes, 40 utterances x 300 frames")
+    for n_speakers in speaker_counts:
+        codebooks, utterances, _ = synthetic_speakers(n_speakers)
+        phrase_codebooks = {f"phrase {i}": codebook[:8] for i, codebook in enumerate(synthetic_speakers(n_phrases, seed=1)[0].values())}
+        separate_time, _ = best_time(lambda: (identify(utterances, codebooks), identify(utterances, phrase_codebooks)))
+        joint_time, _ = best_time(joint_distortions, utterances, codebooks, phrase_codebooks)
+        print(f"  {n_speakers:>5} speakers: two passes {separate_time * 1000:7.1f} ms, joint {joint_time * 1000:7.1f} ms ({separate_time / joint_time:.2f}x)")
+
+BENCHMARKS = {"lbg": benchmark_lbg, "minibatch": benchmark_minibatch, "parallel": benchmark_parallel, "model": benchmark_model,
+              "distortion": benchmark_distortion, "identify": benchmark_identify, "index": benchmark_index, "hierarchy": benchmark_hierarchy,
+              "early": benchmark_early, "scores": benchmark_scores, "vad": benchmark_vad, "decimation": benchmark_decimation,
+              "joint": benchmark_joint, "mfcc": benchmark_mfcc}
+
+if __name__ == "__main__":
+    for name in sys.argv[1:] or BENCHMARKS:
+        BENCHMARKS[name]()
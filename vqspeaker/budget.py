@@ -0,0 +1,30 @@
+"""Cold-start import time check: python -m vqspeaker.budget [module] [budget_s]
+
+Each run imports the module in a fresh interpreter, so nothing is warm
+except the OS page cache.
+"""
+
+import subprocess
+import sys
+
+IMPORT_BUDGET_S = 0.5 # scoring workers must be ready well under a second
+
+def measure_import(module="vqspeaker", runs=5): # best-of-N wall time of `import module` in a fresh process
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    times = [float(subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout) for _ in range(runs)]
+    return min(times)
+
+def heavy_modules_loaded(module="vqspeaker"): # optional dependencies that a plain import must not pull in
+    heavy = ["librosa", "matplotlib", "umap", "scipy", "soundfile", "soxr"]
+    code = f"import sys, {module}; print(' '.join(m for m in {heavy!r} if m in sys.modules))"
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True).stdout.split()
+
+if __name__ == "__main__":
+    module = sys.argv[1] if len(sys.argv) > 1 else "vqspeaker"
+    budget = float(sys.argv[2]) if len(sys.argv) > 2 else IMPORT_BUDGET_S
+    elapsed = measure_import(module)
+    loaded = heavy_modules_loaded(module)
+    print(f"import {module}: {elapsed * 1000:.0f} ms (budget {budget * 1000:.0f} ms)")
+    if loaded:
+        print(f"eagerly imported: {', '.join(loaded)}")
+    sys.exit(0 if elapsed <= budget and not loaded else 1)
@@ -0,0 +1,86 @@
+"""Content-addressed on-disk feature cache with LRU eviction."""
+
+import hashlib
+import json
+import os
+from importlib.metadata import version
+
+import numpy as np
+
+CACHE_DIR = os.environ.get("VQSPEAKER_CACHE_DIR", os.path.expanduser("~/.cache/vqspeaker")) # Colab: point at Drive
+CACHE_MAX_BYTES = 512 * 1024 * 1024 # LRU bound on total cache size
+EVICT_TO = 0.9 # eviction frees down to this fraction of the bound, so the next one is many writes away
+cache_sizes = {} # cache dir -> bytes this process believes are cached; the directory is only scanned when it passes the bound
+
+def file_digest(file_path): # hash raw audio bytes, so edited files miss the cache
+    h = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def cache_key(file_path, params): # audio bytes + every parameter that shapes the features
+    blob = json.dumps(dict(params, librosa=version("librosa")), sort_keys=True) # metadata lookup, no librosa import
+    return hashlib.sha1((file_digest(file_path) + blob).encode()).hexdigest()
+
+def scan_cache(cache_dir): # [(mtime, size, path)] of every entry, one directory pass
+    entries = []
+    with os.scandir(cache_dir) as items:
+        for item in items:
+            if not item.name.endswith(".npy"):
+                continue
+            try:
+                stat = item.stat()
+            except FileNotFoundError: # evicted by another worker since the listing
+                continue
+            entries.append((stat.st_mtime, stat.st_size, item.path))
+    return entries
+
+def evict_cache(cache_dir=None, max_bytes=None): # drop least recently used entries down to EVICT_TO of max_bytes, returns bytes left
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    entries = sorted(scan_cache(cache_dir)) # least recently used first
+    total = sum(size for _, size, _ in entries)
+    if total > max_bytes:
+        for _, size, path in entries:
+            if total <= EVICT_TO * max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError: # already evicted by another worker
+                pass
+            total -= size
+    cache_sizes[cache_dir] = total
+    return total
+
+def cache_lookup(file_path, params, cache_dir=None): # return (entry path, features or None)
+    cache_dir = cache_dir or CACHE_DIR
+    os.makedirs(cache_dir, exist_ok=True)
+    entry = os.path.join(cache_dir, cache_key(file_path, params) + ".npy")
+    try:
+        os.utime(entry) # touch = recently used
+        return entry, np.load(entry)
+    except FileNotFoundError: # never cached, or evicted by another worker since it was touched
+        return entry, None
+
+def cache_store(entry, features, cache_dir=None, max_bytes=None):
+    tmp = f"{entry}.{os.getpid()}.tmp" # per-process temp name, workers may write concurrently
+    with open(tmp, "wb") as f: # write then rename, no half-written entries
+        np.save(f, features)
+        size = f.tell()
+    os.replace(tmp, entry)
+    cache_dir = cache_dir or CACHE_DIR
+    max_bytes = CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    if cache_dir not in cache_sizes: # first write from this process: learn the current size
+        evict_cache(cache_dir, max_bytes)
+    else: # other workers' writes are only seen at the next scan, the bound may be passed by what they added since
+        cache_sizes[cache_dir] += size
+        if cache_sizes[cache_dir] > max_bytes:
+            evict_cache(cache_dir, max_bytes)
+
+def cached_features(file_path, params, compute, cache_dir=None, max_bytes=None):
+    entry, features = cache_lookup(file_path, params, cache_dir)
+    if features is None:
+        features = compute()
+        cache_store(entry, features, cache_dir, max_bytes)
+    return features
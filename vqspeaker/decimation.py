@@ -0,0 +1,47 @@
+"""Frame decimation: score every factor-th, a random 1/factor or one representative per factor frames."""
+
+import time
+
+import numpy as np
+
+METHODS = ("stride", "random", "cluster")
+
+def decimate_frames(test_mfcc, factor=2, method="stride", seed=0): # (about len / factor, n_mfcc) frames to score
+    # random: 1/factor of the frames without replacement, in time order; seed may also be a Generator
+    # cluster: runs of factor consecutive frames (adjacent frames are the redundant ones), each represented by the member
+    # nearest the run's mean; O(frames x n_mfcc), far below scoring the run against every codebook
+    if factor <= 1:
+        return test_mfcc
+    n_frames = len(test_mfcc)
+    if method == "stride":
+        return test_mfcc[::factor]
+    if method == "random":
+        rng = np.random.default_rng(seed)
+        return test_mfcc[np.sort(rng.choice(n_frames, -(-n_frames // factor), replace=False))]
+    if method == "cluster":
+        n_runs = -(-n_frames // factor)
+        padded = np.concatenate([test_mfcc, np.repeat(test_mfcc[-1:], n_runs * factor - n_frames, axis=0)]) # short last run repeats its last frame
+        runs = padded.reshape(n_runs, factor, -1)
+        residuals = runs - runs.mean(axis=1, keepdims=True)
+        nearest = np.einsum("rfd,rfd->rf", residuals, residuals).argmin(axis=1)
+        return runs[np.arange(n_runs), nearest]
+    raise ValueError(f"unknown decimation method {method!r}, expected one of {', '.join(METHODS)}")
+
+def decimation_sweep(test_mfccs, codebooks, true_ids=None, factors=(2, 4, 8, 16), methods=METHODS, repeats=3):
+    # accuracy vs scoring throughput per (method, factor); first row scores every frame (method None, factor 1)
+    # seconds: best of repeats, decimation included; frames_per_second counts the original frames covered
+    from .matching import as_stack, identify, report_agreement # matching imports this module
+    stack = as_stack(codebooks)
+    total_frames = sum(len(test_mfcc) for test_mfcc in test_mfccs)
+    settings = [(None, 1)] + [(method, factor) for method in methods for factor in factors]
+    rows = []
+    for method, factor in settings:
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            decisions = identify(test_mfccs, stack, factor, method)
+            times.append(time.perf_counter() - start)
+        scored = sum(len(decimate_frames(test_mfcc, factor, method)) for test_mfcc in test_mfccs)
+        rows.append({"method": method, "factor": factor, "frames_scored": scored / total_frames, "seconds": min(times),
+                     "frames_per_second": total_frames / min(times), "decisions": decisions})
+    return report_agreement(rows, rows[0]["decisions"], true_ids)
@@ -0,0 +1,60 @@
+"""Incremental scoring: frames in blocks, speakers that cannot win are dropped, stop once the leader is clear."""
+
+import time
+
+import numpy as np
+
+from .matching import as_stack, identify, min_distances, report_agreement, score_weights, select_weights, squared_norms
+
+def early_identify(test_mfcc, codebooks, block_size=32, margin=3.0, min_frames=64, growth=8): # (best speaker, frames used)
+    # a speaker is dropped once its mean paired gap to the leader exceeds margin standard errors, scoring stops when only
+    # the leader is left; blocks grow to 1/growth of the frames seen, so a decision that needs every frame costs a few
+    # dozen checks, not one per block_size frames
+    # running per-speaker sums give the gap means; the squared gaps to the leader are summed as blocks arrive and only
+    # recomputed from the kept blocks (surviving columns only) when the leader changes
+    stack = as_stack(codebooks)
+    if not len(test_mfcc): # no frames, no decision
+        return None, 0
+    active = np.arange(len(stack[2])) # stack positions still in the race
+    weights = score_weights(stack[0], stack[1], np.result_type(test_mfcc.dtype, stack[0].dtype, np.float32)) # padded once, sliced as speakers drop
+    active_weights = weights
+    blocks, sums = [], np.zeros(len(active)) # per-frame distances seen so far, columns follow active
+    leader, gap_squares = None, None
+    n_frames = 0
+    while n_frames < len(test_mfcc):
+        block = min_distances(test_mfcc[n_frames:n_frames + max(block_size, n_frames // growth)], None, weights=active_weights).astype(np.float64)
+        blocks.append(block)
+        sums += block.sum(axis=0)
+        n_frames += len(block)
+        if n_frames < min_frames:
+            continue
+        if sums.argmin() != leader: # new leader: paired gaps change for every frame seen
+            leader = sums.argmin()
+            gap_squares = sum(squared_norms((b - b[:, [leader]]).T) for b in blocks)
+        else:
+            gap_squares += squared_norms((block - block[:, [leader]]).T)
+        gap_means = (sums - sums[leader]) / n_frames
+        standard_error = np.sqrt(np.maximum(gap_squares / n_frames - gap_means ** 2, 0) / n_frames)
+        keep = gap_means <= margin * standard_error # the leader's own gap is 0, it always stays
+        if not keep.all():
+            active, sums, gap_squares = active[keep], sums[keep], gap_squares[keep]
+            blocks = [np.vstack(blocks)[:, keep]]
+            leader = np.count_nonzero(keep[:leader])
+            active_weights = select_weights(weights, active)
+        if len(active) == 1:
+            return stack[2][active[0]], n_frames
+    return stack[2][active[sums.argmin()]], n_frames
+
+def early_report(test_mfccs, codebooks, true_ids=None, margins=(1.0, 2.0, 3.0, 5.0), block_size=32, min_frames=64):
+    # agreement with full-utterance identification, fraction of frames used and time for each margin
+    stack = as_stack(codebooks)
+    total_frames = sum(len(test_mfcc) for test_mfcc in test_mfccs)
+    start = time.perf_counter()
+    exact = identify(test_mfccs, stack)
+    rows = [{"margin": None, "frames_used": 1.0, "seconds": time.perf_counter() - start, "decisions": exact}]
+    for margin in margins:
+        start = time.perf_counter()
+        results = [early_identify(test_mfcc, stack, block_size, margin, min_frames) for test_mfcc in test_mfccs]
+        rows.append({"margin": margin, "frames_used": sum(n_frames for _, n_frames in results) / total_frames,
+                     "seconds": time.perf_counter() - start, "decisions": [speaker for speaker, _ in results]})
+    return report_agreement(rows, exact, true_ids)
@@ -0,0 +1,174 @@
+"""MFCC extraction: per-signal, batched, cached and streaming."""
+
+import os
+from functools import partial
+from itertools import chain
+
+import numpy as np
+
+from .audio import BLOCK_SIZE, design_filter, fast_load, load_audio, lowpass_filter, normalize_audio, resolve_dtype, stream_blocks, stream_stats
+from .cache import cache_lookup, cache_store, cached_features
+from .parallel import CHUNK_SIZE, NUM_WORKERS, chunked, parallel_map
+from .vad import VAD_PARAMS, open_vad_stream, speech_mask, stream_speech
+
+mfcc_bases = {} # (sr, n_fft, n_mels, n_mfcc, dtype) -> (window, mel filterbank, DCT matrix), built once
+FFT_WORKERS = 1 # scipy.fft threads per call; raise it only when no process pool is already using the cores
+
+def compute_sample_time(sr, N=256):
+    time_ms = (N / sr) * 1000
+    print(f"sample time: {time_ms:.2f} ms")
+
+def compute_mfcc(signal, sr, n_mfcc=26, n_fft=1024, hop_length=256):
+    import librosa
+    mfccs = librosa.feature.mfcc(y=signal, sr=sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length)
+    return mfccs # np.ndarray
+
+def get_mfcc_bases(sr, n_fft, n_mels, n_mfcc, dtype=None):
+    dtype = resolve_dtype(dtype)
+    key = (sr, n_fft, n_mels, n_mfcc, dtype.name)
+    if key not in mfcc_bases:
+        import librosa
+        import scipy.fft
+        import scipy.signal
+        window = scipy.signal.get_window("hann", n_fft) # periodic hann, as librosa.stft
+        mel = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+        dct = scipy.fft.dct(np.eye(n_mels), type=2, norm="ortho", axis=0)[:n_mfcc] # dct(S) == dct @ S
+        mfcc_bases[key] = tuple(basis.astype(dtype) for basis in (window, mel.T, dct.T)) # designed in float64, applied in dtype
+    return mfcc_bases[key]
+
+def log_mel_frames(frames, window, mel, workers=FFT_WORKERS): # (frames, n_fft) -> (frames, n_mels) dB, before the top_db clip
+    import scipy.fft
+    # scipy.fft keeps float32 frames in complex64 (np.fft always computes in complex128), about 3x faster per frame
+    power = np.abs(scipy.fft.rfft(frames * window, axis=1, workers=workers)) ** 2
+    return 10.0 * np.log10(np.maximum(power @ mel, 1e-10)) # power_to_db, ref=1.0
+
+def compute_mfcc_batch(signals, sr, n_mfcc=26, n_fft=1024, hop_length=256, n_mels=128, dtype=None, masks=None, workers=FFT_WORKERS): # same numbers as compute_mfcc
+    # masks: optional bool per frame and signal (speech_mask); only the kept frames are transformed
+    # workers: scipy.fft threads for the batch rFFT
+    dtype = resolve_dtype(dtype)
+    window, mel, dct = get_mfcc_bases(sr, n_fft, n_mels, n_mfcc, dtype)
+    # ragged pack: frames of every signal stacked into one (total_frames, n_fft) matrix
+    frames = [np.lib.stride_tricks.sliding_window_view(np.pad(np.asarray(signal, dtype=dtype), n_fft // 2), n_fft)[::hop_length] for signal in signals]
+    if masks is not None:
+        frames = [f[mask] for f, mask in zip(frames, masks)]
+    counts = [f.shape[0] for f in frames]
+    offsets = np.concatenate([[0], np.cumsum(counts)])
+    log_mel = log_mel_frames(np.concatenate(frames), window, mel, workers) # one rFFT for the whole batch
+    peak = np.maximum.reduceat(log_mel.max(axis=1), offsets[:-1]) # top_db clip is per utterance
+    log_mel = np.maximum(log_mel, np.repeat(peak - 80.0, counts)[:, None].astype(dtype))
+    mfccs = log_mel @ dct
+
+    # per-utterance views, (n_mfcc, frames) like compute_mfcc
+    return [mfccs[offsets[i]:offsets[i + 1]].T for i in range(len(signals))]
+
+def mfcc_params(sr=16000, n_mfcc=26, n_fft=1024, hop_length=256, normalize=False, lowpass=None, dtype=None, vad=False, mfcc="librosa"): # cache key parameters
+    # mfcc: "librosa" (compute_mfcc) or "batch" (compute_mfcc_batch); they agree to ~1e-4, not bit for bit
+    params = {"sr": sr, "n_mfcc": n_mfcc, "n_fft": n_fft, "hop_length": hop_length, "normalize": normalize, "lowpass": lowpass, "resampler": "polyphase", "filter": "sosfiltfilt",
+              "dtype": resolve_dtype(dtype).name}
+    if vad: # only when on, so features cached before VAD existed still hit
+        params["vad"] = VAD_PARAMS
+    if mfcc != "librosa": # likewise, librosa features cached before the batch path existed still hit
+        params["mfcc"] = mfcc
+    return params
+
+def featurize_params(sr=16000, vad=False): # featurize_audio's front end; save it with models trained on its features
+    return mfcc_params(sr, normalize=True, lowpass=[3000, 5], vad=vad)
+
+def featurize_audio(file_name, base_path, sr=16000, plot=False, vad=False): # no plots, no globals: safe to run in a worker
+    # (filtered signal, sr, mfccs, decode timings); timings come back with the result, so they survive a process pool
+    # the cache is checked before decoding: a hit returns (None, sr, mfccs, []) unless plot asks for the filtered signal
+    # vad: speech frames only (speech_mask after the lowpass, as featurize_paths), part of the cache key
+    params = featurize_params(sr, vad)
+    entry, mfccs = cache_lookup(os.path.join(base_path, file_name), params)
+    if mfccs is not None and not plot:
+        return None, sr, mfccs, []
+    timings = []
+    signal, sr = load_audio(file_name=file_name, base_path=base_path, sr=sr, timings=timings)
+    filtered_signal = lowpass_filter(normalize_audio(signal), sr)
+    if mfccs is None:
+        mfccs = compute_mfcc(filtered_signal, sr)
+        if vad:
+            mfccs = mfccs[:, speech_mask(filtered_signal)]
+        cache_store(entry, mfccs)
+    return filtered_signal, sr, mfccs, timings
+
+def extract_mfcc(file_path, sr=16000, n_mfcc=26, n_fft=1024, hop_length=256, dtype=None):# extract, but with file path
+    def compute():
+        signal, _ = fast_load(file_path, sr=sr, dtype=dtype)
+        return compute_mfcc(signal, sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length).T
+    return cached_features(file_path, mfcc_params(sr, n_mfcc, n_fft, hop_length, dtype=dtype), compute)
+
+def featurize_files(file_paths, sr=16000, n_mfcc=26, n_fft=1024, hop_length=256, dtype=None, vad=False): # worker task: decode + batch MFCC one chunk
+    timings = []
+    signals = [fast_load(file_path, sr=sr, dtype=dtype, timings=timings)[0] for file_path in file_paths]
+    masks = [speech_mask(signal, n_fft, hop_length) for signal in signals] if vad else None
+    mfccs = [m.T for m in compute_mfcc_batch(signals, sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length, dtype=dtype, masks=masks)]
+    return mfccs, timings # timings travel back with the results from worker processes
+
+def extract_mfcc_batch(file_paths, sr=16000, n_mfcc=26, n_fft=1024, hop_length=256, num_workers=NUM_WORKERS, chunk_size=CHUNK_SIZE, dtype=None, vad=False, timings=None):
+    # extract_mfcc per file, to ~1e-4 and under its own cache key; cache misses are decoded and featurized chunk-wise across a process pool
+    # vad: speech frames only (speech_mask), silence is neither transformed nor returned
+    # timings: list that gets the decode timings of the cache misses, from whichever process decoded them
+    params = mfcc_params(sr, n_mfcc, n_fft, hop_length, dtype=dtype, vad=vad, mfcc="batch")
+    lookups = [cache_lookup(file_path, params) for file_path in file_paths]
+    missing = [i for i, (_, features) in enumerate(lookups) if features is None]
+    task = partial(featurize_files, sr=sr, n_mfcc=n_mfcc, n_fft=n_fft, hop_length=hop_length, dtype=dtype, vad=vad)
+    results = parallel_map(task, chunked([file_paths[i] for i in missing], chunk_size), num_workers)
+    computed = dict(zip(missing, chain.from_iterable(mfccs for mfccs, _ in results)))
+    if timings is not None:
+        timings.extend(chain.from_iterable(chunk_timings for _, chunk_timings in results))
+    mfcc_matrices = []
+    for i, (entry, features) in enumerate(lookups):
+        if features is None:
+            features = computed[i]
+            cache_store(entry, features)
+        mfcc_matrices.append(features)
+    return mfcc_matrices
+
+def open_mfcc_stream(sr=16000, n_mfcc=26, n_fft=1024, hop_length=256, n_mels=128, cutoff=None, order=5, top_db=80.0, dtype=None, vad=False):
+    # incremental MFCC state for push_samples: same framing as compute_mfcc (center=True), samples arrive in any chunk sizes
+    # cutoff: causal lowpass (sosfilt, state carried between chunks); top_db clips against the running peak, not the global one
+    # vad: speech frames only, judged causally (stream_speech) after the lowpass
+    dtype = resolve_dtype(dtype)
+    window, mel, dct = get_mfcc_bases(sr, n_fft, n_mels, n_mfcc, dtype)
+    sos = None if cutoff is None else design_filter("lowpass", sr, cutoff=cutoff, order=order).astype(dtype)
+    return {"bases": (window, mel, dct), "sos": sos, "zi": None if sos is None else np.zeros((sos.shape[0], 2), dtype=dtype),
+            "buffer": np.zeros(n_fft // 2, dtype=dtype), # leading center pad; afterwards holds the unconsumed tail of the last chunk
+            "peak": -np.inf, "n_fft": n_fft, "hop_length": hop_length, "top_db": top_db, "dtype": dtype, "vad": open_vad_stream() if vad else None}
+
+def push_samples(stream, samples): # (frames, n_mfcc) completed by these samples; samples=None flushes the trailing center pad
+    window, mel, dct = stream["bases"]
+    n_fft, hop_length, dtype = stream["n_fft"], stream["hop_length"], stream["dtype"]
+    if samples is None:
+        stream["buffer"] = np.concatenate([stream["buffer"], np.zeros(n_fft // 2, dtype=dtype)])
+    else:
+        samples = np.asarray(samples, dtype=dtype)
+        if stream["sos"] is not None:
+            import scipy.signal
+            samples, stream["zi"] = scipy.signal.sosfilt(stream["sos"], samples, zi=stream["zi"])
+        stream["buffer"] = np.concatenate([stream["buffer"], samples])
+    buffer = stream["buffer"]
+    if len(buffer) < n_fft:
+        return np.empty((0, dct.shape[1]), dtype=dtype)
+    n_frames = 1 + (len(buffer) - n_fft) // hop_length
+    frames = np.lib.stride_tricks.sliding_window_view(buffer, n_fft)[::hop_length][:n_frames]
+    stream["buffer"] = buffer[n_frames * hop_length:] # overlap carried into the next chunk
+    if stream["vad"] is not None:
+        frames = frames[stream_speech(stream["vad"], frames)]
+        if not len(frames):
+            return np.empty((0, dct.shape[1]), dtype=dtype)
+    log_mel = log_mel_frames(frames, window, mel)
+    stream["peak"] = max(stream["peak"], log_mel.max())
+    return np.maximum(log_mel, dtype.type(stream["peak"] - stream["top_db"])) @ dct
+
+def stream_mfcc(file_path, sr=16000, n_mfcc=26, n_fft=1024, hop_length=256, n_mels=128, cutoff=3000, order=5, block_size=BLOCK_SIZE, top_db=80.0, dtype=None,
+                vad=False):
+    # generator of (frames, n_mfcc) arrays, memory bounded by block_size; normalized and lowpassed like featurize_audio
+    # differences from the offline path: lowpass is causal (sosfilt, not filtfilt), top_db clips against the running peak,
+    # vad judges each frame on the stream so far (stream_speech)
+    mean, std = stream_stats(file_path, sr, block_size)
+    stream = open_mfcc_stream(sr, n_mfcc, n_fft, hop_length, n_mels, cutoff, order, top_db, dtype, vad)
+    for block in chain(stream_blocks(file_path, sr, block_size), [None]):
+        mfccs = push_samples(stream, None if block is None else (block - mean) / std)
+        if len(mfccs):
+            yield mfccs
@@ -0,0 +1,47 @@
+"""Coarse-to-fine identification: small per-speaker summary codebooks shortlist, full codebooks decide."""
+
+import time
+
+import numpy as np
+
+from .matching import as_stack, average_distortions, identify, report_agreement, rescore_candidates, stack_codebooks
+from .vq import lbg_train
+
+def summary_codebook(codebook, summary_size=2): # LBG over the speaker's own centroids; 1 = the speaker's mean
+    return lbg_train(codebook, summary_size)[0] if summary_size < len(codebook) else codebook
+
+def build_hierarchy(codebooks, summary_size=2): # codebooks: dict or stacked (centroids, offsets, speaker_ids)
+    stack = as_stack(codebooks)
+    centroids, offsets, speaker_ids = stack
+    bounds = np.append(offsets, len(centroids))
+    summaries = {j: summary_codebook(centroids[bounds[j]:bounds[j + 1]], summary_size) for j in range(len(speaker_ids))} # keyed by stack position
+    return {"summary": stack_codebooks(summaries), "stack": stack, "summary_size": summary_size}
+
+def coarse_to_fine_identify(test_mfccs, hierarchy, shortlist=4): # best speaker per utterance
+    # coarse: every utterance against every summary codebook in one pass; fine: full codebooks of the shortlist only
+    coarse, _ = average_distortions(test_mfccs, hierarchy["summary"])
+    speaker_ids = hierarchy["stack"][2]
+    best = []
+    for test_mfcc, scores in zip(test_mfccs, coarse):
+        if not len(test_mfcc): # no frames, no decision
+            best.append(None)
+            continue
+        candidates = np.argsort(scores)[:shortlist]
+        best.append(speaker_ids[candidates[rescore_candidates(test_mfcc, hierarchy["stack"], candidates).argmin()]])
+    return best
+
+def hierarchy_curve(test_mfccs, codebooks, true_ids=None, summary_sizes=(1, 2, 4), shortlists=(1, 2, 4, 8)):
+    # accuracy vs latency: exact identification, then every (summary_size, shortlist); shortlists past the speaker count are skipped
+    stack = as_stack(codebooks)
+    start = time.perf_counter()
+    exact = identify(test_mfccs, stack)
+    rows = [{"summary_size": None, "shortlist": None, "seconds": time.perf_counter() - start, "decisions": exact}]
+    for summary_size in summary_sizes:
+        hierarchy = build_hierarchy(stack, summary_size) # built once per model, not timed
+        for shortlist in shortlists:
+            if shortlist >= len(stack[2]):
+                continue
+            start = time.perf_counter()
+            decisions = coarse_to_fine_identify(test_mfccs, hierarchy, shortlist)
+            rows.append({"summary_size": summary_size, "shortlist": shortlist, "seconds": time.perf_counter() - start, "decisions": decisions})
+    return report_agreement(rows, exact, true_ids)
@@ -0,0 +1,89 @@
+"""KD-tree over the pooled centroids of every speaker, for scoring against large codebook sets.
+
+The tree lives in the leading principal components of the centroids (a KD-tree over all 26 MFCC
+dimensions degenerates to a linear scan); neighbors it returns are rescored in the full space.
+"""
+
+import time
+
+import numpy as np
+
+from .matching import as_stack, best_speakers, identify, report_agreement, rescore_candidates
+
+def build_centroid_index(codebooks, n_components=8, leafsize=16): # codebooks: dict or stacked (centroids, offsets, speaker_ids)
+    from scipy.spatial import cKDTree
+    centroids, offsets, speaker_ids = as_stack(codebooks)
+    owners = np.repeat(np.arange(len(offsets)), np.diff(np.append(offsets, len(centroids)))) # speaker index of every centroid
+    mean = centroids.mean(axis=0, dtype=np.float64)
+    basis = np.linalg.svd(centroids - mean, full_matrices=False)[2][:n_components].T # (dim, n_components)
+    return {"tree": cKDTree((centroids - mean) @ basis, leafsize=leafsize), "mean": mean, "basis": basis, "owners": owners,
+            "stack": (centroids, offsets, speaker_ids)}
+
+def query_index(index, frames, top_m=4, workers=1): # (frames, top_m) projected distances and centroid rows, nearest first
+    projected, neighbors = index["tree"].query((frames - index["mean"]) @ index["basis"], k=top_m, workers=workers)
+    return projected.reshape(len(frames), -1), neighbors.reshape(len(frames), -1) # top_m=1 drops the axis
+
+def index_distortions(test_mfccs, index, top_m=16, workers=1): # approximate (utterances, speakers) avg min dist from the global top-M
+    # each frame only sees its top_m nearest centroids in the projected space, rescored in the full space; a speaker with
+    # none of them gets the farthest of those distances, since its own nearest centroid ranked further out
+    centroids, _, speaker_ids = index["stack"]
+    n_speakers = len(speaker_ids)
+    counts = np.array([len(test_mfcc) for test_mfcc in test_mfccs])
+    frames = np.vstack(test_mfccs)
+    _, neighbors = query_index(index, frames, top_m, workers)
+    residuals = frames[:, None, :] - centroids[neighbors]
+    distances = np.sqrt(np.einsum("ijk,ijk->ij", residuals, residuals))
+    bound = distances.max(axis=1)
+    utterance = np.repeat(np.arange(len(counts)), counts)
+    keys = np.arange(len(frames))[:, None] * n_speakers + index["owners"][neighbors]
+    order = np.lexsort((distances.ravel(), keys.ravel())) # by (frame, speaker), nearest first
+    keys, distances = keys.ravel()[order], distances.ravel()[order]
+    first = np.concatenate([[True], keys[1:] != keys[:-1]]) # each speaker's nearest listed centroid per frame
+    rows, speakers = np.divmod(keys[first], n_speakers)
+    corrections = np.bincount(utterance[rows] * n_speakers + speakers, weights=distances[first] - bound[rows],
+                              minlength=len(counts) * n_speakers).reshape(len(counts), n_speakers)
+    distortions = (np.bincount(utterance, weights=bound, minlength=len(counts))[:, None] + corrections) / np.maximum(counts[:, None], 1)
+    distortions[counts == 0] = np.nan # empty utterance, as in average_distortions
+    return distortions, speaker_ids
+
+def index_votes(test_mfccs, index, top_m=4, workers=1): # (utterances, speakers) count of top_m neighbors each speaker owns
+    n_speakers = len(index["stack"][2])
+    counts = np.array([len(test_mfcc) for test_mfcc in test_mfccs])
+    _, neighbors = query_index(index, np.vstack(test_mfccs), top_m, workers)
+    utterance = np.repeat(np.arange(len(counts)), counts * neighbors.shape[1])
+    return np.bincount(utterance * n_speakers + index["owners"][neighbors].ravel(), minlength=len(counts) * n_speakers).reshape(len(counts), n_speakers)
+
+def index_identify(test_mfccs, index, top_m=4, shortlist=8, workers=1): # best speaker per utterance
+    # shortlist > 0: the speakers owning most of the utterance's top_m neighbors are scored exactly against their full
+    # codebooks, so per-frame cost is a tree query plus shortlist codebooks; shortlist = 0: argmin of index_distortions
+    speaker_ids = index["stack"][2]
+    if not shortlist:
+        approximate, _ = index_distortions(test_mfccs, index, top_m, workers)
+        return best_speakers(approximate, speaker_ids)
+    best = []
+    for test_mfcc, votes in zip(test_mfccs, index_votes(test_mfccs, index, top_m, workers)):
+        if not len(test_mfcc): # no frames, no decision
+            best.append(None)
+            continue
+        candidates = np.argsort(votes)[::-1][:shortlist]
+        best.append(speaker_ids[candidates[rescore_candidates(test_mfcc, index["stack"], candidates).argmin()]])
+    return best
+
+def index_report(test_mfccs, codebooks, true_ids=None, top_ms=(1, 4, 16), shortlists=(0, 8), workers=1):
+    # agreement of the index decisions with exact identification (and accuracy, given true ids), with timings
+    stack = as_stack(codebooks)
+    start = time.perf_counter()
+    exact = identify(test_mfccs, stack)
+    exact_time = time.perf_counter() - start
+    start = time.perf_counter()
+    index = build_centroid_index(stack)
+    rows = [{"top_m": None, "shortlist": None, "seconds": exact_time, "build_seconds": 0.0, "decisions": exact}]
+    build_time = time.perf_counter() - start
+    for top_m in top_ms:
+        for shortlist in shortlists:
+            if top_m == 1 and not shortlist: # one neighbor per frame ties every unlisted speaker with the listed one
+                continue
+            start = time.perf_counter()
+            decisions = index_identify(test_mfccs, index, min(top_m, len(stack[0])), shortlist, workers)
+            rows.append({"top_m": top_m, "shortlist": shortlist, "seconds": time.perf_counter() - start, "build_seconds": build_time, "decisions": decisions})
+    return report_agreement(rows, exact, true_ids)
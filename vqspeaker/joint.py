@@ -0,0 +1,44 @@
+"""Joint speaker + phrase identification: both codebook sets stacked, every frame's distances computed once."""
+
+import numpy as np
+
+from .matching import average_distortions, best_speakers, stack_codebooks
+
+def joint_distortions(test_mfccs, speaker_codebooks, phrase_codebooks): # ((speaker matrix, speaker ids), (phrase matrix, phrase ids))
+    # one stack, keys tagged so a speaker id can never collide with a phrase name; each half is what average_distortions
+    # returns for that codebook set alone
+    stack = stack_codebooks({**{("speaker", key): codebook for key, codebook in speaker_codebooks.items()},
+                             **{("phrase", key): codebook for key, codebook in phrase_codebooks.items()}})
+    distortions, _ = average_distortions(test_mfccs, stack)
+    n_speakers = len(speaker_codebooks)
+    return (distortions[:, :n_speakers], list(speaker_codebooks)), (distortions[:, n_speakers:], list(phrase_codebooks))
+
+def joint_identify(test_mfccs, speaker_codebooks, phrase_codebooks, allowed_pairs=None): # (speakers, phrases, (speaker, phrase) pairs)
+    # pairs: the best speaker + phrase distortion sum; allowed_pairs (speaker -> set of phrases it enrolled, e.g. the
+    # script's labels dict of phrase per file as {speaker: set(phrases) for speaker, phrases in labels.items()}) limits it
+    # to combinations seen in training, without it the pair is just the two separate decisions
+    (speaker_scores, speaker_ids), (phrase_scores, phrase_ids) = joint_distortions(test_mfccs, speaker_codebooks, phrase_codebooks)
+    speakers, phrases = best_speakers(speaker_scores, speaker_ids), best_speakers(phrase_scores, phrase_ids) # None for empty utterances
+    allowed = np.ones((len(speaker_ids), len(phrase_ids)), dtype=bool)
+    if allowed_pairs is not None:
+        allowed = np.array([[phrase_id in allowed_pairs.get(speaker_id, ()) for phrase_id in phrase_ids] for speaker_id in speaker_ids])
+    pair_scores = np.where(allowed, speaker_scores[:, :, None] + phrase_scores[:, None, :], np.inf) # (utterances, speakers, phrases)
+    best = pair_scores.reshape(len(pair_scores), -1).argmin(axis=1)
+    pairs = [(speaker_ids[j // len(phrase_ids)], phrase_ids[j % len(phrase_ids)]) if speaker is not None else None for j, speaker in zip(best, speakers)]
+    return speakers, phrases, pairs
+
+def joint_accuracies(speakers, phrases, true_speakers, true_phrases, pairs=None): # overall and per true phrase
+    # speaker / phrase: each decision on its own; combined: both right (the pair decision when given, else the separate ones)
+    pairs = pairs if pairs is not None else list(zip(speakers, phrases))
+    speaker_right = np.array([a == b for a, b in zip(speakers, true_speakers)])
+    phrase_right = np.array([a == b for a, b in zip(phrases, true_phrases)])
+    combined_right = np.array([pair == (speaker, phrase) for pair, speaker, phrase in zip(pairs, true_speakers, true_phrases)])
+    true_phrases = np.array(true_phrases, dtype=object)
+
+    def rates(members):
+        return {"speaker": float(speaker_right[members].mean()), "phrase": float(phrase_right[members].mean()),
+                "combined": float(combined_right[members].mean()), "count": int(members.sum())}
+
+    report = rates(np.ones(len(speaker_right), dtype=bool))
+    report["per_phrase"] = {phrase: rates(true_phrases == phrase) for phrase in dict.fromkeys(true_phrases)}
+    return report
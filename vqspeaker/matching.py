@@ -0,0 +1,134 @@
+"""Speaker matching by average minimum VQ distortion."""
+
+import numpy as np
+
+from .decimation import decimate_frames
+
+FRAME_CHUNK = 512 # test frames per GEMM block, keeps the (chunk, centroids) block cache-sized
+BLOCK_ELEMENTS = 1 << 20 # cap on a (centroids, frames) block, thousands of speakers are scored a tile at a time
+UTTERANCE_FRAMES = 1 << 16 # test frames stacked per min_distances call, bounds the copy of the test set
+
+def squared_norms(matrix): # row-wise ||x||^2
+    return np.einsum("ij,ij->i", matrix, matrix)
+
+def pad_segments(centroids, offsets): # equal-size segments: shorter codebooks repeat their last centroid, no min changes
+    sizes = np.diff(np.append(offsets, len(centroids)))
+    size = sizes.max()
+    return centroids[(offsets[:, None] + np.minimum(np.arange(size), sizes[:, None] - 1)).ravel()], size
+
+def score_weights(centroids, offsets=None, dtype=None): # (padded [-2c, ||c||^2] rows, segment size), built once per codebook set
+    # what min_distances scores frames against; callers scoring many small blocks (streams, early stopping) build it once
+    dtype = np.result_type(centroids.dtype, np.float32) if dtype is None else dtype
+    centroids, size = pad_segments(np.asarray(centroids, dtype), np.zeros(1, np.intp) if offsets is None else np.asarray(offsets))
+    return np.hstack([-2 * centroids, squared_norms(centroids)[:, None]]), size # [x, 1] . [-2c, ||c||^2] = ||c||^2 - 2 x.c
+
+def select_weights(weights, positions): # score_weights restricted to some speakers (segments), no re-padding
+    rows, size = weights
+    return rows.reshape(-1, size, rows.shape[1])[positions].reshape(-1, rows.shape[1]), size
+
+def min_distances(frames, centroids, offsets=None, chunk_size=FRAME_CHUNK, row_offsets=None, weights=None):
+    # euclidean distance of each frame to its nearest centroid, (frames,), or to each speaker's nearest, (frames, speakers),
+    # when offsets split the stacked centroids; ||x||^2 - 2 x.c + ||c||^2 with one GEMM per chunk, in the inputs' float dtype
+    # row_offsets: first frame of each utterance; returns float64 per-utterance sums, (utterances, speakers), instead
+    # weights: score_weights output to use instead of centroids and offsets, always (frames, speakers)
+    per_speaker = offsets is not None or weights is not None
+    if weights is None:
+        weights = score_weights(centroids, offsets, np.result_type(frames.dtype, centroids.dtype, np.float32))
+    weights, size = weights
+    dtype = np.result_type(frames.dtype, weights.dtype)
+    weights = weights.astype(dtype, copy=False)
+    n_segments = len(weights) // size
+    if row_offsets is None:
+        out = np.empty((len(frames), n_segments), dtype)
+    else:
+        out = np.zeros((len(row_offsets), n_segments))
+        utterance = np.repeat(np.arange(len(row_offsets)), np.diff(np.append(row_offsets, len(frames))))
+    tile = max(1, BLOCK_ELEMENTS // (size * min(chunk_size, max(len(frames), 1)))) # speakers per GEMM, thousands are tiled
+    for start in range(0, len(frames), chunk_size):
+        block = np.asarray(frames[start:start + chunk_size], dtype)
+        augmented = np.hstack([block, np.ones((len(block), 1), dtype)]).T
+        frame_norms = squared_norms(block)
+        if row_offsets is not None: # one-hot (frames, utterances in this chunk): frame sums become a small GEMM
+            labels = utterance[start:start + len(block)]
+            members = (labels[:, None] == np.arange(labels[0], labels[-1] + 1)).astype(dtype)
+        for first in range(0, n_segments, tile):
+            last = min(first + tile, n_segments)
+            sq_dist = weights[first * size:last * size] @ augmented # (centroids, frames)
+            nearest = sq_dist.reshape(last - first, size, len(block)).min(axis=1) # centroid-major: segmented min over a middle axis
+            nearest += frame_norms # constant per frame, added after the min
+            np.sqrt(np.maximum(nearest, 0, out=nearest), out=nearest) # sqrt of the minima only
+            if row_offsets is None:
+                out[start:start + len(block), first:last] = nearest.T
+            else:
+                out[labels[0]:labels[-1] + 1, first:last] += (nearest @ members).T
+    if row_offsets is not None:
+        return out
+    return out if per_speaker else out[:, 0]
+
+def speaker_distortion(test_mfcc, codebook): # avg min dist to one codebook
+    return np.mean(min_distances(test_mfcc, codebook), dtype=np.float64)  # avg min dist
+
+def match_speaker(test_mfcc, codebooks, factor=1, method="stride", seed=0): # best speaker (or phrase) over a dict of codebooks
+    # factor > 1 scores about 1/factor of the frames, picked by method (decimate_frames)
+    return identify([test_mfcc], codebooks, factor, method, seed)[0]
+
+def stack_codebooks(codebooks): # dict -> one (total centroids, dim) matrix, per-speaker column offsets, speaker ids
+    speaker_ids = list(codebooks)
+    centroids = np.vstack([codebooks[speaker_id] for speaker_id in speaker_ids])
+    offsets = np.cumsum([0] + [len(codebooks[speaker_id]) for speaker_id in speaker_ids[:-1]])
+    return centroids, offsets, speaker_ids
+
+def as_stack(codebooks): # dict or already stacked (centroids, offsets, speaker_ids) -> stacked
+    return codebooks if isinstance(codebooks, tuple) else stack_codebooks(codebooks)
+
+def utterance_groups(counts, max_frames=UTTERANCE_FRAMES): # consecutive (first, last) utterance ranges of about max_frames frames
+    groups, first, total = [], 0, 0
+    for i, count in enumerate(counts):
+        if total and total + count > max_frames: # an utterance longer than max_frames still gets a group of its own
+            groups.append((first, i))
+            first, total = i, 0
+        total += count
+    return groups + [(first, len(counts))] if len(counts) else groups
+
+def average_distortions(test_mfccs, codebooks, max_frames=UTTERANCE_FRAMES): # (utterances, speakers) avg min dist, plus speaker ids
+    # codebooks: dict, or an already stacked (centroids, offsets, speaker_ids), e.g. from registry_stack
+    # utterances are stacked max_frames at a time, every group scored against every speaker in one pass
+    centroids, offsets, speaker_ids = as_stack(codebooks)
+    counts = np.array([len(test_mfcc) for test_mfcc in test_mfccs])
+    distortions = np.empty((len(counts), len(speaker_ids)))
+    weights = score_weights(centroids, offsets, np.result_type(centroids.dtype, np.float32, *{test_mfcc.dtype for test_mfcc in test_mfccs})) # once for every group
+    for first, last in utterance_groups(counts, max_frames):
+        row_offsets = np.concatenate([[0], np.cumsum(counts[first:last])[:-1]])
+        sums = min_distances(np.vstack(test_mfccs[first:last]), centroids, offsets, row_offsets=row_offsets, weights=weights) # per-speaker min, summed per utterance
+        distortions[first:last] = sums / np.maximum(counts[first:last, None], 1)
+    distortions[counts == 0] = np.nan # an utterance with no frames has no distortion, and gets no decision
+    return distortions, speaker_ids
+
+def best_speakers(distortions, speaker_ids): # argmin of every row of an average_distortions matrix, None for an empty utterance
+    return [speaker_ids[j] if np.isfinite(row[j]) else None for row, j in zip(distortions, np.nan_to_num(distortions, nan=np.inf).argmin(axis=1))]
+
+def identify(test_mfccs, codebooks, factor=1, method="stride", seed=0): # best speaker (or phrase) per utterance, all utterances x all speakers in one pass
+    if factor > 1:
+        rng = np.random.default_rng(seed) # one generator for the batch, not one per utterance
+        test_mfccs = [decimate_frames(test_mfcc, factor, method, rng) for test_mfcc in test_mfccs]
+    return best_speakers(*average_distortions(test_mfccs, codebooks))
+
+def report_agreement(rows, exact, true_ids=None): # report rows carrying "decisions" -> agreement with exact (and accuracy)
+    for row in rows:
+        decisions = row.pop("decisions")
+        row["agreement"] = float(np.mean([a == b for a, b in zip(decisions, exact)]))
+        if true_ids is not None:
+            row["accuracy"] = float(np.mean([a == b for a, b in zip(decisions, true_ids)]))
+    return rows
+
+def select_speakers(codebooks, positions): # stacked (centroids, offsets, speaker_ids) restricted to some stack positions
+    centroids, offsets, speaker_ids = codebooks
+    bounds = np.append(offsets, len(centroids))
+    sizes = bounds[positions + 1] - bounds[positions]
+    rows = np.concatenate([np.arange(bounds[j], bounds[j + 1]) for j in positions])
+    return centroids[rows], np.concatenate([[0], np.cumsum(sizes)[:-1]]), [speaker_ids[j] for j in positions]
+
+def rescore_candidates(test_mfcc, codebooks, candidates): # exact avg min dist of one utterance to a few stacked speakers
+    # codebooks: stacked (centroids, offsets, speaker_ids); candidates: speaker positions in the stack
+    distortions, _ = average_distortions([test_mfcc], select_speakers(codebooks, candidates))
+    return distortions[0]
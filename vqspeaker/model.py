@@ -0,0 +1,67 @@
+"""Versioned on-disk model: every codebook in one memory-mapped matrix plus a JSON header."""
+
+import json
+import os
+
+import numpy as np
+
+MODEL_VERSION = 1 # bump when the layout or header fields change
+
+def save_model(path, codebooks, params, normalization=None): # codebooks: dict or stacked (centroids, offsets, ids) tuple
+    # params: the mfcc_params() the codebooks were trained on; normalization: optional per-coefficient (mean, std)
+    if isinstance(codebooks, tuple):
+        centroids, offsets, speaker_ids = codebooks
+        bounds = np.append(offsets, len(centroids))
+        codebooks = {speaker_id: centroids[bounds[i]:bounds[i + 1]] for i, speaker_id in enumerate(speaker_ids)}
+    speakers, start = [], 0
+    for speaker_id, codebook in codebooks.items():
+        speakers.append([speaker_id, start, start + len(codebook)])
+        start += len(codebook)
+    dim = next(iter(codebooks.values())).shape[1]
+    dtype = np.result_type(*codebooks.values()) # stored as trained: float64 codebooks stay float64
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    centroids = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=dtype, shape=(start, dim))
+    for (_, begin, stop), codebook in zip(speakers, codebooks.values()):
+        centroids[begin:stop] = codebook
+    centroids.flush()
+    header = {"version": MODEL_VERSION, "shape": [start, dim], "params": params, "speakers": speakers}
+    if normalization is not None:
+        header["normalization"] = {"mean": np.asarray(normalization[0]).tolist(), "std": np.asarray(normalization[1]).tolist()}
+    with open(path + ".json", "w") as f:
+        json.dump(header, f)
+    return path
+
+def check_params(model, params): # refuse features extracted differently from the training features
+    mismatched = sorted(key for key in set(model["params"]) | set(params) if model["params"].get(key) != params.get(key))
+    if mismatched:
+        details = ", ".join(f"{key}: model {model['params'].get(key)!r}, features {params.get(key)!r}" for key in mismatched)
+        raise ValueError(f"feature parameters do not match the model ({details})")
+
+def load_model(path, params=None): # header parse + memmap, no centroid is read until it is scored
+    with open(path + ".json") as f:
+        header = json.load(f)
+    if header.get("version") != MODEL_VERSION:
+        raise ValueError(f"{path}: model format version {header.get('version')}, this code reads version {MODEL_VERSION}")
+    speakers = header["speakers"]
+    model = {"centroids": np.load(path + ".npy", mmap_mode="r"), "offsets": np.array([start for _, start, _ in speakers], dtype=np.intp),
+             "speaker_ids": [speaker_id for speaker_id, _, _ in speakers], "params": header["params"], "version": header["version"],
+             "normalization": None}
+    if "normalization" in header:
+        model["normalization"] = (np.array(header["normalization"]["mean"]), np.array(header["normalization"]["std"]))
+    if params is not None:
+        check_params(model, params)
+    return model
+
+def model_stack(model): # (centroids, offsets, speaker_ids), accepted by average_distortions as is
+    return model["centroids"], model["offsets"], model["speaker_ids"]
+
+def model_codebooks(model): # speaker -> zero-copy codebook view, the dict match_speaker takes
+    bounds = np.append(model["offsets"], len(model["centroids"]))
+    return {speaker_id: model["centroids"][bounds[i]:bounds[i + 1]] for i, speaker_id in enumerate(model["speaker_ids"])}
+
+def normalize_features(model, mfcc): # apply the stored per-coefficient stats, if the model was trained on normalized MFCCs
+    if model["normalization"] is None:
+        return mfcc
+    mean, std = model["normalization"]
+    return (mfcc - mean) / std
@@ -0,0 +1,83 @@
+"""Process-pool fan-out with results in input order."""
+
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+NUM_WORKERS = os.cpu_count() or 1
+CHUNK_SIZE = 8 # files per task, amortizes pickling and per-batch MFCC setup
+BLAS_THREADS = 1 # per worker, so workers x BLAS threads stays within the cores
+BLAS_ENV = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS", "BLIS_NUM_THREADS", "VECLIB_MAXIMUM_THREADS")
+blas_limits = [] # worker side: keeps the threadpoolctl limit alive
+attached = {} # worker side: shared memory buffers and read-only file maps by name
+
+def cap_blas_threads(num_threads=BLAS_THREADS): # pool initializer
+    for name in BLAS_ENV: # honoured by BLAS libraries loaded after this point (spawned workers)
+        os.environ[name] = str(num_threads)
+    try:
+        from threadpoolctl import threadpool_limits
+    except ImportError:
+        return
+    blas_limits.append(threadpool_limits(num_threads)) # forked workers inherit an initialized BLAS, limit it in place
+
+def pool_context(): # fork, or None where the platform has no fork
+    # forked workers inherit the parent's modules, so functions defined in a script or notebook (__main__) can be sent to them
+    # and the caller needs no __main__ guard; spawn/forkserver workers re-import __main__ and cannot find them
+    import multiprocessing
+    return multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+
+def parallel_map(func, items, num_workers=NUM_WORKERS, chunk_size=1, blas_threads=None): # results come back in input order
+    items = list(items)
+    context = pool_context()
+    if num_workers <= 1 or len(items) <= 1 or context is None: # no fork: serial rather than a pool that cannot start
+        return [func(item) for item in items]
+    initializer, initargs = (cap_blas_threads, (blas_threads,)) if blas_threads else (None, ())
+    with ProcessPoolExecutor(max_workers=min(num_workers, len(items)), mp_context=context, initializer=initializer, initargs=initargs) as pool:
+        return list(pool.map(func, items, chunksize=chunk_size))
+
+def chunked(items, chunk_size=CHUNK_SIZE):
+    return [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+
+def mapped_region(matrix): # (file path, byte offset) of a C-contiguous np.memmap view, None for arrays in memory
+    mapping = getattr(matrix, "_mmap", None)
+    if not isinstance(matrix, np.memmap) or mapping is None or matrix.filename is None or not matrix.flags.c_contiguous:
+        return None
+    mapping_start = matrix.offset - matrix.offset % mmap.ALLOCATIONGRANULARITY # where np.memmap began the mapping in the file
+    return matrix.filename, mapping_start + matrix.ctypes.data - np.frombuffer(mapping, np.uint8).ctypes.data
+
+def share_arrays(groups): # pass matrices (or lists of per-file matrices) to workers without pickling them
+    # memmap views (feature store slices) are passed as (path, offset, shape) and reopened read-only in the worker, so
+    # the store is paged in on demand rather than loaded into /dev/shm; everything else is packed into one shared
+    # memory block. Returns (block or None, specs), one spec per group; the caller closes and unlinks the block once
+    # the pool is done
+    from multiprocessing.shared_memory import SharedMemory
+    singles = [isinstance(group, np.ndarray) for group in groups]
+    groups = [[group] if single else list(group) for group, single in zip(groups, singles)]
+    regions = [[mapped_region(matrix) for matrix in group] for group in groups]
+    copied = [matrix for group, group_regions in zip(groups, regions) for matrix, region in zip(group, group_regions) if region is None]
+    block = SharedMemory(create=True, size=max(sum(matrix.nbytes for matrix in copied), 1)) if copied else None
+    specs, start = [], 0
+    for group, group_regions, single in zip(groups, regions, singles):
+        pieces = []
+        for matrix, region in zip(group, group_regions):
+            if region is not None:
+                pieces.append(("file", region[0], region[1], matrix.shape))
+                continue
+            np.ndarray(matrix.shape, matrix.dtype, buffer=block.buf, offset=start)[...] = matrix # copied file by file, no stacked intermediate
+            pieces.append(("memory", block.name, start, matrix.shape))
+            start += matrix.nbytes
+        specs.append((pieces, group[0].dtype.str, single))
+    return block, specs
+
+def attach_array(spec): # zero-copy view (or per-file views) of a share_arrays group inside a worker
+    from multiprocessing.shared_memory import SharedMemory
+    pieces, dtype, single = spec
+    views = []
+    for kind, name, offset, shape in pieces:
+        if name not in attached: # attached once per worker; the parent's resource tracker owns shared memory cleanup
+            attached[name] = SharedMemory(name=name) if kind == "memory" else np.memmap(name, np.uint8, mode="r")
+        buffer = attached[name].buf if kind == "memory" else attached[name]
+        views.append(np.ndarray(shape, np.dtype(dtype), buffer=buffer, offset=offset))
+    return views[0] if single else views
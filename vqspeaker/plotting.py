@@ -0,0 +1,80 @@
+"""Figures. matplotlib, librosa.display and umap are imported on first use only."""
+
+import numpy as np
+
+from .features import compute_mfcc
+
+def plot_waveform(signal, sr, title="Waveform"):
+    import librosa.display
+    import matplotlib.pyplot as plt
+    plt.figure(figsize=(10, 4))
+    librosa.display.waveshow(signal, sr=sr)
+    plt.title(title)
+    plt.xlabel("Time (s)")
+    plt.ylabel("Amplitude")
+    plt.show()
+
+
+def plot_stft(signal, sr, n_fft=1024, hop_length=256, title="STFT Spectrogram"):
+    import librosa
+    import librosa.display
+    import matplotlib.pyplot as plt
+    D = librosa.stft(signal, n_fft=n_fft, hop_length=hop_length)
+    D_db = librosa.amplitude_to_db(np.abs(D), ref=np.max)
+    plt.figure(figsize=(10, 4))
+    librosa.display.specshow(D_db, sr=sr, hop_length=hop_length, x_axis='time', y_axis='log')
+    plt.colorbar(label="Decibels (dB)")
+    plt.title(title)
+    plt.show()
+
+# Different window sizes mfcc
+def compare_mfcc(signal, sr):
+    import librosa.display
+    import matplotlib.pyplot as plt
+    n_fft_values = [128, 256, 512]
+    plt.figure(figsize=(12, 6))
+    for i, n_fft in enumerate(n_fft_values):
+        mfccs = compute_mfcc(signal, sr, n_mfcc=26, n_fft=n_fft, hop_length=n_fft//2)
+        plt.subplot(1, 3, i+1)
+        librosa.display.specshow(mfccs, sr=sr, x_axis='time')
+        plt.colorbar(label="MFCC Coefficients")
+        plt.title(f"MFCC (N={n_fft})")
+    plt.tight_layout()
+    plt.show()
+
+def plot_mel_filterbank(sr=16000, n_fft=1024, n_mels=26):
+    import librosa
+    import matplotlib.pyplot as plt
+    mel_filters = librosa.filters.mel(sr=sr, n_fft=n_fft, n_mels=n_mels)
+    plt.figure(figsize=(10, 4))
+    for i in range(mel_filters.shape[0]):
+        plt.plot(mel_filters[i], label=f"Mel {i+1}")
+    plt.title("Mel-Spaced Filterbank")
+    plt.xlabel("Frequency Bin")
+    plt.ylabel("Amplitude")
+    plt.show()
+
+def plot_vq_codebook_umap(mfcc_features, labels, codebooks):
+    import matplotlib.pyplot as plt
+    import umap
+    if isinstance(mfcc_features, dict): # nested dicts of lists
+        all_mfcc_features = np.vstack([np.vstack(features) for features in mfcc_features.values()])
+        all_labels = np.concatenate([np.concatenate(label) for label in labels.values()])
+    else: # feature store frames + store_labels, no copy
+        all_mfcc_features, all_labels = mfcc_features, labels
+    reducer = umap.UMAP(n_components=2, n_neighbors=20, min_dist=0.05, metric='euclidean') #dimension reduce
+    reduced_mfcc = reducer.fit_transform(all_mfcc_features)
+    reduced_codebooks = {speaker: reducer.transform(codebooks[speaker]) for speaker in codebooks}
+
+    plt.figure(figsize=(8, 6))
+    scatter = plt.scatter(reduced_mfcc[:, 0], reduced_mfcc[:, 1], c=all_labels, cmap='rainbow', alpha=0.3, label="MFCC Features")
+    # mark x on graph
+    for speaker, reduced_codebook in reduced_codebooks.items():
+        plt.scatter(reduced_codebook[:, 0], reduced_codebook[:, 1], marker='x', s=100, label=f"Speaker {speaker}")
+
+    plt.colorbar(scatter, label="Speaker ID")
+    plt.title("VQ Codebook Clustering in 2D Space")
+    plt.xlabel("Dimension 1")
+    plt.ylabel("Dimension 2")
+    plt.legend()
+    plt.show()
@@ -0,0 +1,94 @@
+"""Persistent codebook registry: enroll, re-enroll or remove one speaker without retraining the rest."""
+
+import json
+import os
+
+import numpy as np
+
+from .vq import train_codebook
+
+def write_atomic(path, save): # write then rename, no half-written files
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w" if path.endswith(".json") else "wb") as f:
+        save(f)
+    os.replace(tmp, path)
+
+def write_index(registry):
+    groups = {group: [[key, file_name] for key, file_name in files.items()] for group, files in registry["files"].items()}
+    write_atomic(os.path.join(registry["path"], "index.json"), lambda f: json.dump({"groups": groups, "next_file": registry["next_file"]}, f))
+
+def set_slot(registry, group, key, codebook): # copy codebook into the group's stacked matrix, in place when re-enrolling
+    # every codebook of a group has the same size, so speaker i owns rows [i*k, (i+1)*k)
+    state = registry["groups"].get(group)
+    if state is None:
+        state = registry["groups"][group] = {"centroids": np.empty((0, codebook.shape[1]), codebook.dtype), "keys": [], "slots": {}, "size": len(codebook)}
+    k, dim = state["size"], state["centroids"].shape[1]
+    if codebook.shape != (k, dim):
+        raise ValueError(f"{group} codebooks are {k}x{dim}, got {codebook.shape[0]}x{codebook.shape[1]}")
+    slot = state["slots"].get(key)
+    if slot is None: # new key: append a slot, growing the buffer by doubling
+        slot = len(state["keys"])
+        if (slot + 1) * k > len(state["centroids"]):
+            grown = np.empty((max(2 * len(state["centroids"]), k), dim), state["centroids"].dtype)
+            grown[:slot * k] = state["centroids"][:slot * k]
+            state["centroids"] = grown
+        state["keys"].append(key)
+        state["slots"][key] = slot
+    state["centroids"][slot * k:(slot + 1) * k] = codebook
+
+def clear_slot(registry, group, key): # move the last slot into the hole, O(one codebook)
+    state = registry["groups"][group]
+    k, slot = state["size"], state["slots"].pop(key)
+    last_key = state["keys"].pop()
+    if last_key != key:
+        last = len(state["keys"])
+        state["centroids"][slot * k:(slot + 1) * k] = state["centroids"][last * k:(last + 1) * k]
+        state["keys"][slot] = last_key
+        state["slots"][last_key] = slot
+
+def open_registry(path): # directory with one .npy per codebook plus index.json; created empty if missing
+    os.makedirs(path, exist_ok=True)
+    index = {"groups": {}, "next_file": 0}
+    if os.path.exists(os.path.join(path, "index.json")):
+        with open(os.path.join(path, "index.json")) as f:
+            index = json.load(f)
+    registry = {"path": path, "files": {}, "groups": {}, "next_file": index["next_file"]}
+    for group, entries in index["groups"].items():
+        registry["files"][group] = {}
+        for key, file_name in entries: # keys keep their JSON type, ints stay ints
+            set_slot(registry, group, key, np.load(os.path.join(path, file_name)))
+            registry["files"][group][key] = file_name
+    return registry
+
+def add_codebook(registry, key, codebook, group="speakers"): # store an already trained codebook, replacing any old one
+    files = registry["files"].setdefault(group, {})
+    set_slot(registry, group, key, codebook) # shape check before anything touches the disk
+    if key not in files:
+        files[key] = f"{group}-{registry['next_file']}.npy"
+        registry["next_file"] += 1
+    write_atomic(os.path.join(registry["path"], files[key]), lambda f: np.save(f, codebook))
+    write_index(registry)
+
+def enroll(registry, key, features, group="speakers", num_clusters=16, **train_params): # train only this speaker's codebook
+    # features: the speaker's per-file MFCC matrices (or one matrix); re-enrolling an existing key retrains it
+    codebook = train_codebook(features, num_clusters, **train_params)
+    add_codebook(registry, key, codebook, group)
+    return codebook
+
+def remove(registry, key, group="speakers"):
+    clear_slot(registry, group, key)
+    file_name = registry["files"][group].pop(key)
+    write_index(registry) # index first, so a crash leaves an orphan file rather than a dangling entry
+    os.remove(os.path.join(registry["path"], file_name))
+
+def registry_codebooks(registry, group="speakers"): # key -> codebook view, the dict match_speaker takes
+    state = registry["groups"].get(group)
+    if state is None:
+        return {}
+    k = state["size"]
+    return {key: state["centroids"][slot * k:(slot + 1) * k] for key, slot in state["slots"].items()}
+
+def registry_stack(registry, group="speakers"): # (centroids, offsets, keys) as stack_codebooks returns, without re-stacking
+    state = registry["groups"][group]
+    n, k = len(state["keys"]), state["size"]
+    return state["centroids"][:n * k], np.arange(n) * k, list(state["keys"])
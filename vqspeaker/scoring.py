@@ -0,0 +1,37 @@
+"""Analyses of one (utterances, speakers) average-distortion matrix: top-k, ranks, margins, confusion, without rescoring."""
+
+import numpy as np
+
+def top_k(distortions, speaker_ids, k=3): # k best speakers per utterance, best first
+    k = min(k, distortions.shape[1])
+    nearest = np.argpartition(distortions, k - 1, axis=1)[:, :k]
+    order = np.take_along_axis(distortions, nearest, axis=1).argsort(axis=1, kind="stable")
+    return [[speaker_ids[j] for j in row] for row in np.take_along_axis(nearest, order, axis=1)]
+
+def true_ranks(distortions, speaker_ids, true_ids): # 1-based rank of each utterance's true speaker, 0 if it has no codebook or no frames
+    positions = {speaker_id: j for j, speaker_id in enumerate(speaker_ids)}
+    ranks = np.zeros(len(true_ids), dtype=np.intp)
+    for i, true_id in enumerate(true_ids):
+        if true_id in positions and not np.isnan(distortions[i]).all():
+            ranks[i] = 1 + np.count_nonzero(distortions[i] < distortions[i, positions[true_id]]) # ties rank in its favor
+    return ranks
+
+def decision_margins(distortions): # runner-up minus best distortion per utterance, how clear each decision was
+    if distortions.shape[1] < 2:
+        return np.full(len(distortions), np.inf)
+    two_best = np.partition(distortions, 1, axis=1)[:, :2]
+    return two_best[:, 1] - two_best[:, 0]
+
+def top_k_accuracy(distortions, speaker_ids, true_ids, ks=(1, 2, 3)): # {k: fraction of utterances with the true speaker in the top k}
+    ranks = true_ranks(distortions, speaker_ids, true_ids)
+    return {k: float(np.mean((ranks > 0) & (ranks <= k))) for k in ks}
+
+def confusion_matrix(distortions, speaker_ids, true_ids): # counts[true, predicted], rows and columns in speaker_ids order
+    # utterances whose true speaker has no codebook, and empty utterances (no decision), are left out
+    positions = {speaker_id: j for j, speaker_id in enumerate(speaker_ids)}
+    counts = np.zeros((len(speaker_ids), len(speaker_ids)), dtype=np.intp)
+    predicted = distortions.argmin(axis=1)
+    for i, true_id in enumerate(true_ids):
+        if true_id in positions and not np.isnan(distortions[i]).all():
+            counts[positions[true_id], predicted[i]] += 1
+    return counts
@@ -0,0 +1,60 @@
+"""Packed, memory-mapped feature store."""
+
+import json
+import os
+from itertools import chain
+
+import numpy as np
+
+def write_feature_store(path, mfcc_features, phrases=None, file_names=None): # one contiguous float32 matrix + offset index
+    # phrases: speaker -> phrase per file, parallel to mfcc_features (the 0/12, 5/11 labels dicts)
+    # file_names: speaker -> path (or name) per file, parallel too; kept in each entry as "file" for file_view lookups,
+    # without it "file" is only the file's position among its speaker's files and file_view takes (speaker, position)
+    # speaker-major layout, so every speaker's frames are one contiguous slice
+    files, speakers = [], []
+    start = 0
+    for speaker_id, features in mfcc_features.items():
+        speaker_start = start
+        for j, mfcc_matrix in enumerate(features):
+            phrase = phrases[speaker_id][j] if phrases else None
+            file_name = file_names[speaker_id][j] if file_names else j
+            files.append({"speaker": speaker_id, "phrase": phrase, "file": file_name, "start": start, "stop": start + len(mfcc_matrix)})
+            start += len(mfcc_matrix)
+        speakers.append([speaker_id, speaker_start, start])
+    n_mfcc = next(iter(mfcc_features.values()))[0].shape[1]
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    frames = np.lib.format.open_memmap(path + ".npy", mode="w+", dtype=np.float32, shape=(start, n_mfcc))
+    for entry, mfcc_matrix in zip(files, chain.from_iterable(mfcc_features.values())):
+        frames[entry["start"]:entry["stop"]] = mfcc_matrix # written one file at a time, never stacked in RAM
+    frames.flush()
+    with open(path + ".json", "w") as f:
+        json.dump({"shape": [start, n_mfcc], "files": files, "speakers": speakers, "named": bool(file_names)}, f)
+    return path
+
+def open_feature_store(path): # frames stay on disk, np.memmap pages them in on access
+    with open(path + ".json") as f:
+        index = json.load(f)
+    frames = np.load(path + ".npy", mmap_mode="r")
+    speakers = {speaker_id: (start, stop) for speaker_id, start, stop in index["speakers"]}
+    if index.get("named"):
+        by_file = {entry["file"]: entry for entry in index["files"]}
+    else: # positions repeat across speakers
+        by_file = {(entry["speaker"], entry["file"]): entry for entry in index["files"]}
+    return {"frames": frames, "files": index["files"], "speakers": speakers, "by_file": by_file}
+
+def speaker_views(store): # speaker -> zero-copy (frames, n_mfcc) view
+    return {speaker_id: store["frames"][start:stop] for speaker_id, (start, stop) in store["speakers"].items()}
+
+def file_view(store, file_name): # zero-copy view of one file, by the name it was written with, else by (speaker, position)
+    entry = store["by_file"][file_name]
+    return store["frames"][entry["start"]:entry["stop"]]
+
+def phrase_views(store): # phrase -> list of per-file views
+    phrases = {}
+    for entry in store["files"]:
+        phrases.setdefault(entry["phrase"], []).append(store["frames"][entry["start"]:entry["stop"]])
+    return phrases
+
+def store_labels(store): # per-frame speaker id, for plotting
+    return np.concatenate([np.full(stop - start, speaker_id) for speaker_id, (start, stop) in store["speakers"].items()])
@@ -0,0 +1,160 @@
+"""Live identification: incremental MFCC and running per-speaker distortion, served to many streams over a local socket."""
+
+import asyncio
+import json
+import struct
+import time
+
+import numpy as np
+
+from .audio import resolve_dtype
+from .features import open_mfcc_stream, push_samples
+from .matching import as_stack, min_distances, score_weights
+
+MAX_CHUNK = 4096 # samples scored before yielding to other streams, bounds how long one stream holds the event loop
+PERCENTILES = (50, 90, 99)
+HEADER = struct.Struct("<I") # each message: payload length in bytes, then int16 mono PCM at the service rate; length 0 ends the stream
+MAX_PAYLOAD = 1 << 20 # bytes per message (~33 s at 16 kHz); a longer header is refused before anything is read
+
+def stream_weights(stack, dtype=None): # score_weights of a stack for frames in the MFCC stream's dtype
+    return score_weights(stack[0], stack[1], np.result_type(resolve_dtype(dtype), stack[0].dtype, np.float32))
+
+def open_stream(codebooks, window=None, sr=16000, weights=None, **mfcc_params): # codebooks: dict or stacked (centroids, offsets, speaker_ids)
+    # window: frames the rolling decision looks back over, None = everything since the stream opened
+    # weights: score_weights of the stack, shared by every stream of a service; built here when not given
+    stack = as_stack(codebooks)
+    weights = stream_weights(stack, mfcc_params.get("dtype")) if weights is None else weights
+    return {"mfcc": open_mfcc_stream(sr, **mfcc_params), "stack": stack, "weights": weights, "window": window, "frames": 0,
+            "sums": np.zeros(len(stack[2])), "recent": np.empty((0, len(stack[2]))), "latencies": []}
+
+def update_stream(stream, samples): # feed PCM samples (None flushes), returns the current decision
+    mfccs = push_samples(stream["mfcc"], samples)
+    if len(mfccs):
+        distances = min_distances(mfccs, None, weights=stream["weights"]) # (frames, speakers), padded codebooks built at open_stream
+        stream["sums"] += distances.sum(axis=0, dtype=np.float64)
+        stream["frames"] += len(distances)
+        if stream["window"] is not None: # drop the frames that slid out of the window
+            recent = np.vstack([stream["recent"], distances])
+            expired = max(len(recent) - stream["window"], 0)
+            stream["sums"] -= recent[:expired].sum(axis=0, dtype=np.float64)
+            stream["recent"] = recent[expired:]
+    return stream_decision(stream)
+
+def stream_decision(stream): # rolling best speaker and its average distortion over the window
+    n_frames = stream["frames"] if stream["window"] is None else len(stream["recent"])
+    if not n_frames:
+        return {"speaker": None, "distortion": None, "frames": stream["frames"]}
+    best = int(stream["sums"].argmin())
+    return {"speaker": stream["stack"][2][best], "distortion": float(stream["sums"][best] / n_frames), "frames": stream["frames"]}
+
+def latency_percentiles(latencies, percentiles=PERCENTILES): # seconds -> {"p50": ms, ...}
+    if not len(latencies):
+        return {}
+    return {f"p{p}": float(v) * 1000 for p, v in zip(percentiles, np.percentile(latencies, percentiles))}
+
+def send_json(writer, message): # one JSON line per reply; numpy scalars (speaker ids) as plain values
+    writer.write(json.dumps(message, default=lambda value: value.item()).encode() + b"\n")
+
+async def serve_stream(service, reader, writer): # one connection = one stream, replies after every chunk
+    stream_id = service["next_id"]
+    service["next_id"] += 1
+    stream = open_stream(service["stack"], service["window"], service["sr"], service["weights"], **service["mfcc_params"])
+    service["streams"][stream_id] = stream
+    service["latencies"][stream_id] = stream["latencies"] # outlives the stream
+    try:
+        while True:
+            (n_bytes,) = HEADER.unpack(await reader.readexactly(HEADER.size))
+            if n_bytes > service["max_payload"] or n_bytes % 2: # the header is not trusted: no huge reads, no half samples
+                send_json(writer, {"error": f"bad message length {n_bytes} (even, at most {service['max_payload']} bytes)", "final": True})
+                await writer.drain()
+                break
+            payload = await reader.readexactly(n_bytes) if n_bytes else None
+            start = time.perf_counter() # from chunk received to reply written, including waits for other streams
+            if payload is None:
+                decision = update_stream(stream, None)
+            else:
+                samples = np.frombuffer(payload, dtype="<i2").astype(np.float32) / 32768.0
+                for begin in range(0, len(samples), service["max_chunk"]):
+                    decision = update_stream(stream, samples[begin:begin + service["max_chunk"]])
+                    await asyncio.sleep(0)
+            stream["latencies"].append(time.perf_counter() - start)
+            if payload is None:
+                send_json(writer, {**decision, "final": True, "latency_ms": latency_percentiles(stream["latencies"])})
+                await writer.drain()
+                break
+            send_json(writer, decision)
+            await writer.drain()
+    except asyncio.IncompleteReadError: # client went away mid-stream
+        pass
+    finally:
+        del service["streams"][stream_id]
+        writer.close()
+
+async def start_service(codebooks, host="127.0.0.1", port=0, window=None, sr=16000, max_chunk=MAX_CHUNK, max_payload=MAX_PAYLOAD, **mfcc_params):
+    # asyncio TCP server on localhost, port 0 picks a free one (service["port"]); mfcc_params as open_mfcc_stream
+    # a message longer than max_payload bytes, or of odd length, gets an error line and the connection is closed
+    service = {"stack": as_stack(codebooks), "window": window, "sr": sr, "max_chunk": max_chunk, "max_payload": max_payload,
+               "mfcc_params": mfcc_params, "streams": {}, "latencies": {}, "next_id": 0}
+    service["weights"] = stream_weights(service["stack"], mfcc_params.get("dtype")) # built once, shared by every connection
+    service["server"] = await asyncio.start_server(lambda reader, writer: serve_stream(service, reader, writer), host, port)
+    service["host"], service["port"] = service["server"].sockets[0].getsockname()[:2]
+    return service
+
+def service_latencies(service, percentiles=PERCENTILES): # per-stream and pooled chunk latency percentiles, ms
+    report = {stream_id: latency_percentiles(latencies, percentiles) for stream_id, latencies in service["latencies"].items()}
+    pooled = [latency for latencies in service["latencies"].values() for latency in latencies]
+    report["all"] = latency_percentiles(pooled, percentiles)
+    return report
+
+async def replay_file(file_path, host, port, sr=16000, chunk_size=1024, realtime=False): # file-replay client, stands in for a microphone
+    # sends int16 chunks of chunk_size samples (paced at the audio rate if realtime), returns every reply, the final one last
+    # (empty if the server dropped the connection)
+    from .audio import stream_blocks
+    reader, writer = await asyncio.open_connection(host, port)
+    replies = []
+
+    async def receive():
+        while not replies or not replies[-1].get("final"):
+            line = await reader.readline()
+            if not line: # server closed the connection
+                break
+            replies.append(json.loads(line))
+
+    receiver = asyncio.ensure_future(receive())
+    pending = np.empty(0, dtype=np.float32)
+    for block in stream_blocks(file_path, sr, chunk_size):
+        pending = np.concatenate([pending, block])
+        while len(pending) >= chunk_size:
+            chunk, pending = pending[:chunk_size], pending[chunk_size:]
+            payload = (np.clip(chunk, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+            writer.write(HEADER.pack(len(payload)) + payload)
+            await writer.drain()
+            if realtime:
+                await asyncio.sleep(chunk_size / sr)
+    if len(pending): # short last chunk
+        payload = (np.clip(pending, -1.0, 1.0) * 32767).astype("<i2").tobytes()
+        writer.write(HEADER.pack(len(payload)) + payload)
+    writer.write(HEADER.pack(0)) # end of stream
+    await writer.drain()
+    await receiver
+    writer.close()
+    return replies
+
+async def replay_files(file_paths, codebooks, sr=16000, chunk_size=1024, realtime=False, **service_params):
+    # one service, every file streamed concurrently from its own connection; (final decision per file, latency report)
+    service = await start_service(codebooks, sr=sr, **service_params)
+    try:
+        results = await asyncio.gather(*(replay_file(path, service["host"], service["port"], sr, chunk_size, realtime) for path in file_paths))
+    finally:
+        service["server"].close()
+        await service["server"].wait_closed()
+    return [replies[-1] if replies else None for replies in results], service_latencies(service)
+
+def run_replay(file_paths, codebooks, **replay_params): # replay_files from synchronous code, also inside a notebook's running loop
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(replay_files(file_paths, codebooks, **replay_params))
+    from concurrent.futures import ThreadPoolExecutor
+    with ThreadPoolExecutor(1) as executor: # a loop is already running here (Colab/Jupyter): use a fresh one in a thread
+        return executor.submit(asyncio.run, replay_files(file_paths, codebooks, **replay_params)).result()
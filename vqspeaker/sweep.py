@@ -0,0 +1,18 @@
+"""Notch-frequency sweep: every file decoded once, all variants featurized and scored together."""
+
+from .audio import fast_load, filter_signals, normalize_audio, notch_filter
+from .features import compute_mfcc_batch
+from .matching import average_distortions
+from .vad import speech_mask
+
+def notch_sweep(file_paths, notch_frequencies, codebooks, sr=16000, quality_factor=42, dtype=None, vad=False):
+    # returns (frequency x file x speaker) avg-distortion cube and the speaker ids of its last axis
+    # vad: speech frames only, one mask per file (from the unfiltered signal) shared by all of its variants
+    signals = [normalize_audio(fast_load(file_path, sr=sr, dtype=dtype)[0], dtype) for file_path in file_paths] # decode once
+    variants = []
+    for freq in notch_frequencies: # files at their own length (filter_signals), one filter call per frequency and distinct length
+        variants.extend(filter_signals(signals, notch_filter, sr, freq=freq, quality_factor=quality_factor))
+    masks = [speech_mask(signal) for signal in signals] * len(notch_frequencies) if vad else None
+    mfccs = [m.T for m in compute_mfcc_batch(variants, sr, dtype=dtype, masks=masks)] # all frequencies x files in one batch
+    distortions, speaker_ids = average_distortions(mfccs, codebooks)
+    return distortions.reshape(len(notch_frequencies), len(file_paths), -1), speaker_ids
@@ -0,0 +1,15 @@
+import numpy as np
+
+from vqspeaker.audio import filter_signals, lowpass_filter, notch_filter
+
+def ragged_signals(lengths=(4000, 16000, 4000, 9000), seed=0):
+    rng = np.random.default_rng(seed)
+    return [rng.normal(size=n).astype(np.float32) for n in lengths]
+
+def test_filter_signals_matches_per_signal():
+    signals = ragged_signals()
+    for filter_func, kwargs in ((lowpass_filter, {}), (notch_filter, {"freq": 1000.0})):
+        filtered = filter_signals(signals, filter_func, 16000, **kwargs)
+        for signal, row in zip(signals, filtered):
+            assert row.shape == signal.shape and row.dtype == signal.dtype
+            np.testing.assert_allclose(row, filter_func(signal, 16000, **kwargs), rtol=0, atol=1e-5)
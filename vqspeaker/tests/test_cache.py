@@ -0,0 +1,34 @@
+import os
+
+import numpy as np
+import soundfile as sf
+
+from vqspeaker import cache
+from vqspeaker.cache import cache_lookup, cache_store
+from vqspeaker.features import extract_mfcc, extract_mfcc_batch
+
+def write_tone(path, sr=16000, seconds=1.0):
+    t = np.arange(int(sr * seconds)) / sr
+    sf.write(path, (0.3 * np.sin(2 * np.pi * 440 * t) + 0.01 * np.random.default_rng(0).normal(size=len(t))).astype(np.float32), sr)
+    return path
+
+def test_lookup_of_evicted_entry_is_a_miss(tmp_path, monkeypatch):
+    file_path = write_tone(str(tmp_path / "tone.wav"))
+    entry, features = cache_lookup(file_path, {"n": 1}, str(tmp_path / "cache"))
+    assert features is None
+    cache_store(entry, np.ones(3), str(tmp_path / "cache"))
+    real_load = np.load
+    def evicted_load(path, *args, **kwargs): # another worker removes the entry between the touch and the read
+        os.remove(path)
+        return real_load(path, *args, **kwargs)
+    monkeypatch.setattr(cache.np, "load", evicted_load)
+    assert cache_lookup(file_path, {"n": 1}, str(tmp_path / "cache")) == (entry, None)
+
+def test_librosa_and_batch_features_cached_apart(tmp_path, monkeypatch):
+    monkeypatch.setattr(cache, "CACHE_DIR", str(tmp_path / "cache"))
+    file_path = write_tone(str(tmp_path / "tone.wav"))
+    (batch,) = extract_mfcc_batch([file_path], num_workers=1)
+    single = extract_mfcc(file_path)
+    assert len(os.listdir(tmp_path / "cache")) == 2
+    assert not np.array_equal(batch, single) # computed by librosa, not read back from the batch entry
+    np.testing.assert_allclose(batch, single, rtol=0, atol=1e-3)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from vqspeaker.benchmarks import best_time, synthetic_speakers
+from vqspeaker.early import early_identify
+from vqspeaker.matching import identify
+
+def long_utterance(n_frames, spread, near_copies=0):
+    codebooks, utterances, speaker_ids = synthetic_speakers(20, n_utterances=1, frames_per_utterance=n_frames, spread=spread)
+    rng = np.random.default_rng(1)
+    for j in range(1, near_copies + 1): # speakers that never separate from the true one: every frame gets scored
+        codebooks[100 + j] = (codebooks[speaker_ids[0]] + 1e-4 * j * rng.normal(size=codebooks[speaker_ids[0]].shape)).astype(np.float32)
+    return codebooks, utterances[0], speaker_ids[0]
+
+def test_early_matches_exact():
+    codebooks, utterances, _ = synthetic_speakers(20, n_utterances=30, frames_per_utterance=600, spread=1.5, seed=2)
+    assert [early_identify(u, codebooks)[0] for u in utterances] == identify(utterances, codebooks)
+
+def test_early_beats_exact_on_long_utterance():
+    codebooks, utterance, speaker_id = long_utterance(65536, spread=1.0)
+    early_time, (speaker, used) = best_time(early_identify, utterance, codebooks)
+    exact_time, exact = best_time(identify, [utterance], codebooks)
+    assert speaker == exact[0] == speaker_id and used < len(utterance)
+    assert early_time < exact_time
+
+def test_early_near_tie_scores_every_frame_at_exact_cost():
+    codebooks, utterance, _ = long_utterance(65536, spread=0.6, near_copies=3)
+    early_time, (speaker, used) = best_time(early_identify, utterance, codebooks)
+    exact_time, exact = best_time(identify, [utterance], codebooks)
+    assert speaker == exact[0] and used == len(utterance)
+    assert early_time < 2 * exact_time # block-by-block rescans were ~35x
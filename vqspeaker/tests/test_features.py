@@ -0,0 +1,23 @@
+import numpy as np
+
+from vqspeaker.features import compute_mfcc, compute_mfcc_batch, open_mfcc_stream, push_samples
+
+def noise_signals(lengths=(16000, 9000, 23456), seed=0): # broadband: no frame falls top_db below the peak
+    rng = np.random.default_rng(seed)
+    return [0.1 * rng.normal(size=n) for n in lengths]
+
+def test_batch_mfcc_matches_librosa():
+    signals = noise_signals()
+    for dtype, atol in ((np.float64, 1e-9), (np.float32, 1e-3)): # float32: rounding only, on values up to ~130
+        batch = compute_mfcc_batch([signal.astype(dtype) for signal in signals], 16000, dtype=dtype)
+        for signal, mfccs in zip(signals, batch):
+            reference = compute_mfcc(signal, 16000)
+            assert mfccs.shape == reference.shape and mfccs.dtype == dtype
+            np.testing.assert_allclose(mfccs, reference, rtol=0, atol=atol)
+
+def test_streamed_mfcc_matches_batch():
+    signal = noise_signals()[2]
+    stream = open_mfcc_stream(dtype=np.float64)
+    chunks = [push_samples(stream, signal[start:start + 777]) for start in range(0, len(signal), 777)] + [push_samples(stream, None)]
+    (batch,) = compute_mfcc_batch([signal], 16000, dtype=np.float64)
+    np.testing.assert_allclose(np.vstack(chunks), batch.T, rtol=0, atol=1e-9)
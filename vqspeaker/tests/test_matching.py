@@ -0,0 +1,52 @@
+import warnings
+
+import numpy as np
+from scipy.spatial.distance import cdist
+
+from vqspeaker.early import early_identify
+from vqspeaker.joint import joint_identify
+from vqspeaker.matching import average_distortions, identify, min_distances, stack_codebooks
+from vqspeaker.scoring import confusion_matrix, true_ranks
+
+def codebooks_and_utterances(seed=0):
+    rng = np.random.default_rng(seed)
+    codebooks = {speaker_id: (rng.normal(size=(16, 26)) + speaker_id).astype(np.float32) for speaker_id in (1, 2, 3)}
+    utterances = [(rng.normal(size=(60, 26)) + speaker_id).astype(np.float32) for speaker_id in (3, 2)]
+    return codebooks, utterances
+
+def test_empty_utterance_gets_no_decision():
+    codebooks, (first, second) = codebooks_and_utterances()
+    empty = np.empty((0, 26), dtype=np.float32)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error") # no 0/0
+        distortions, speaker_ids = average_distortions([first, empty, second], codebooks)
+    assert np.isnan(distortions[1]).all() and np.isfinite(distortions[[0, 2]]).all()
+    assert identify([first, empty, second], codebooks) == [3, None, 2]
+    assert identify([empty], codebooks) == [None]
+    assert early_identify(empty, codebooks) == (None, 0)
+    speakers, phrases, pairs = joint_identify([empty, first], codebooks, {"a": codebooks[1], "b": codebooks[3]})
+    assert (speakers[0], phrases[0], pairs[0]) == (None, None, None) and pairs[1] == (3, "b")
+    assert list(true_ranks(distortions, speaker_ids, [3, 1, 2])) == [1, 0, 1] # the empty one is not a hit
+    assert confusion_matrix(distortions, speaker_ids, [3, 1, 2]).sum() == 2
+
+def test_gemm_distances_match_cdist():
+    rng = np.random.default_rng(1)
+    codebooks = {speaker_id: rng.normal(size=(size, 26)) for speaker_id, size in ((1, 16), (2, 8), (3, 5))} # padded segments
+    frames = rng.normal(size=(1000, 26))
+    expected = np.column_stack([cdist(frames, codebook).min(axis=1) for codebook in codebooks.values()])
+    centroids, offsets, _ = stack_codebooks(codebooks)
+    for dtype, atol in ((np.float64, 1e-9), (np.float32, 1e-3)):
+        distances = min_distances(frames.astype(dtype), centroids.astype(dtype), offsets, chunk_size=128)
+        assert distances.dtype == dtype
+        np.testing.assert_allclose(distances, expected, rtol=0, atol=atol)
+    np.testing.assert_allclose(min_distances(frames, codebooks[1]), expected[:, 0], rtol=0, atol=1e-9)
+    row_offsets = np.array([0, 300, 301, 700])
+    sums = min_distances(frames, centroids, offsets, chunk_size=128, row_offsets=row_offsets)
+    np.testing.assert_allclose(sums, np.add.reduceat(expected, row_offsets, axis=0), rtol=1e-12)
+
+def test_average_distortions_match_per_utterance():
+    codebooks, utterances = codebooks_and_utterances(2)
+    utterances = utterances * 3 # several groups at max_frames=150
+    distortions, speaker_ids = average_distortions(utterances, codebooks, max_frames=150)
+    expected = [[cdist(u, codebooks[speaker_id]).min(axis=1).mean() for speaker_id in speaker_ids] for u in utterances]
+    np.testing.assert_allclose(distortions, expected, rtol=1e-5)
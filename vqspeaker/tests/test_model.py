@@ -0,0 +1,35 @@
+import numpy as np
+import pytest
+
+from vqspeaker.features import featurize_params
+from vqspeaker.matching import stack_codebooks
+from vqspeaker.model import load_model, model_codebooks, model_stack, normalize_features, save_model
+
+def test_model_keeps_codebook_dtype(tmp_path):
+    rng = np.random.default_rng(0)
+    codebooks = {speaker_id: rng.normal(size=(16, 26)) for speaker_id in (1, 2, 3)} # float64
+    model = load_model(save_model(str(tmp_path / "model"), codebooks, featurize_params()), featurize_params())
+    assert model["centroids"].dtype == np.float64
+    for speaker_id, codebook in model_codebooks(model).items():
+        np.testing.assert_array_equal(codebook, codebooks[speaker_id])
+
+def test_model_refuses_other_front_end(tmp_path):
+    codebooks = {1: np.zeros((4, 26), dtype=np.float32)}
+    path = save_model(str(tmp_path / "model"), codebooks, featurize_params(vad=False))
+    with pytest.raises(ValueError, match="vad"):
+        load_model(path, featurize_params(vad=True))
+
+def test_model_round_trip_from_stack(tmp_path):
+    rng = np.random.default_rng(1)
+    codebooks = {"a": rng.normal(size=(16, 26)).astype(np.float32), "b": rng.normal(size=(8, 26)).astype(np.float32)}
+    normalization = (rng.normal(size=26), rng.uniform(1, 2, size=26))
+    path = save_model(str(tmp_path / "model"), stack_codebooks(codebooks), featurize_params(), normalization)
+    model = load_model(path)
+    centroids, offsets, speaker_ids = model_stack(model)
+    expected = stack_codebooks(codebooks)
+    np.testing.assert_array_equal(centroids, expected[0])
+    np.testing.assert_array_equal(offsets, expected[1])
+    assert speaker_ids == expected[2] and model["params"] == featurize_params()
+    for stored, given in zip(model["normalization"], normalization):
+        np.testing.assert_array_equal(stored, given)
+    np.testing.assert_allclose(normalize_features(model, np.ones((3, 26))), np.tile((1 - normalization[0]) / normalization[1], (3, 1)))
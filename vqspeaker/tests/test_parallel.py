@@ -0,0 +1,33 @@
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+from vqspeaker import parallel
+from vqspeaker.parallel import parallel_map
+
+def test_parallel_map_keeps_order():
+    assert parallel_map(abs, range(-20, 0), num_workers=2, chunk_size=3) == list(range(20, 0, -1))
+
+@pytest.mark.skipif(parallel.pool_context() is None, reason="no fork on this platform")
+def test_parallel_map_runs_main_functions_without_guard():
+    # a script with no __main__ guard, its task defined in __main__, spawn as the default start method
+    script = textwrap.dedent("""
+        import multiprocessing
+        from vqspeaker.parallel import parallel_map
+        multiprocessing.set_start_method("spawn", force=True)
+        def square(x):
+            return x * x
+        print(parallel_map(square, range(6), num_workers=2))
+    """)
+    result = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, timeout=60, 
+                            cwd=os.path.dirname(os.path.dirname(parallel.__file__)))
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "[0, 1, 4, 9, 16, 25]"
+
+def test_parallel_map_without_fork_runs_serially(monkeypatch):
+    monkeypatch.setattr(parallel, "pool_context", lambda: None)
+    offset = 10
+    assert parallel_map(lambda x: x + offset, range(4), num_workers=4) == [10, 11, 12, 13] # a lambda cannot be pickled to a pool
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from vqspeaker.matching import stack_codebooks
+from vqspeaker.registry import add_codebook, enroll, open_registry, registry_codebooks, registry_stack, remove
+
+def random_codebooks(keys, seed=0):
+    rng = np.random.default_rng(seed)
+    return {key: rng.normal(size=(16, 26)).astype(np.float32) for key in keys}
+
+def assert_same_codebooks(actual, expected):
+    assert sorted(actual) == sorted(expected)
+    for key, codebook in expected.items():
+        np.testing.assert_array_equal(actual[key], codebook)
+
+def test_registry_round_trip(tmp_path):
+    path = str(tmp_path / "registry")
+    codebooks = random_codebooks(range(1, 6))
+    registry = open_registry(path)
+    for key, codebook in codebooks.items():
+        add_codebook(registry, key, codebook)
+    remove(registry, 2) # the last slot moves into the hole
+    del codebooks[2]
+    codebooks[4] = codebooks[1] + 1
+    add_codebook(registry, 4, codebooks[4]) # replaced in place
+    codebooks[7] = enroll(registry, 7, [np.random.default_rng(1).normal(size=(200, 26)).astype(np.float32)])
+    assert_same_codebooks(registry_codebooks(registry), codebooks)
+    reopened = open_registry(path)
+    assert_same_codebooks(registry_codebooks(reopened), codebooks) # int keys stay ints through the JSON index
+    centroids, offsets, keys = registry_stack(reopened)
+    expected = stack_codebooks({key: codebooks[key] for key in keys})
+    np.testing.assert_array_equal(centroids, expected[0])
+    np.testing.assert_array_equal(offsets, expected[1])
+
+def test_registry_refuses_other_codebook_size(tmp_path):
+    registry = open_registry(str(tmp_path / "registry"))
+    add_codebook(registry, 1, np.zeros((16, 26), np.float32))
+    with pytest.raises(ValueError, match="16x26"):
+        add_codebook(registry, 2, np.zeros((8, 26), np.float32))
+    assert list(open_registry(str(tmp_path / "registry"))["files"]["speakers"]) == [1]
@@ -0,0 +1,36 @@
+import numpy as np
+
+from vqspeaker.store import file_view, open_feature_store, phrase_views, speaker_views, store_labels, write_feature_store
+
+def speaker_files(seed=0): # speaker -> per-file (frames, 26) matrices, file lengths differ
+    rng = np.random.default_rng(seed)
+    return {speaker_id: [rng.normal(size=(40 + 10 * j + speaker_id, 26)).astype(np.float32) for j in range(3)] for speaker_id in (1, 2)}
+
+def test_file_view_by_name(tmp_path):
+    mfcc_features = speaker_files()
+    file_names = {speaker_id: [f"s{speaker_id}_{j}.wav" for j in range(3)] for speaker_id in mfcc_features}
+    store = open_feature_store(write_feature_store(str(tmp_path / "store"), mfcc_features, file_names=file_names))
+    for speaker_id, features in mfcc_features.items():
+        for name, mfcc_matrix in zip(file_names[speaker_id], features):
+            np.testing.assert_array_equal(file_view(store, name), mfcc_matrix)
+        np.testing.assert_array_equal(speaker_views(store)[speaker_id], np.vstack(features))
+
+def test_file_view_without_names_keys_on_speaker(tmp_path):
+    mfcc_features = speaker_files()
+    store = open_feature_store(write_feature_store(str(tmp_path / "store"), mfcc_features))
+    assert len(store["by_file"]) == 6 # positions 0..2 of both speakers, no collisions
+    for speaker_id, features in mfcc_features.items():
+        for j, mfcc_matrix in enumerate(features):
+            np.testing.assert_array_equal(file_view(store, (speaker_id, j)), mfcc_matrix)
+
+def test_store_round_trip_with_phrases(tmp_path):
+    mfcc_features = speaker_files(1)
+    phrases = {speaker_id: ["zero", "twelve", "zero"] for speaker_id in mfcc_features}
+    store = open_feature_store(write_feature_store(str(tmp_path / "store"), mfcc_features, phrases=phrases))
+    assert store["frames"].dtype == np.float32 and len(store["frames"]) == sum(len(m) for f in mfcc_features.values() for m in f)
+    views = phrase_views(store)
+    assert sorted(views) == ["twelve", "zero"]
+    expected = [m for speaker_id, features in mfcc_features.items() for m, phrase in zip(features, phrases[speaker_id]) if phrase == "zero"]
+    for view, mfcc_matrix in zip(views["zero"], expected):
+        np.testing.assert_array_equal(view, mfcc_matrix)
+    assert list(store_labels(store)) == [speaker_id for speaker_id, features in mfcc_features.items() for m in features for _ in range(len(m))]
@@ -0,0 +1,67 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+import soundfile as sf
+
+from vqspeaker.features import compute_mfcc_batch
+from vqspeaker.matching import average_distortions, identify
+from vqspeaker.streaming import HEADER, open_stream, run_replay, start_service, update_stream
+
+def synthetic_codebooks(seed=0):
+    rng = np.random.default_rng(seed)
+    return {speaker_id: rng.normal(size=(16, 26)).astype(np.float32) for speaker_id in (1, 2, 3)}
+
+async def send_raw(message, **service_params): # reply lines to one raw message, and the streams left open after it
+    service = await start_service(synthetic_codebooks(), **service_params)
+    try:
+        reader, writer = await asyncio.open_connection(service["host"], service["port"])
+        writer.write(message)
+        await writer.drain()
+        replies = [json.loads(line) for line in (await asyncio.wait_for(reader.read(), 10)).splitlines()]
+        writer.close()
+        return replies, service["streams"]
+    finally:
+        service["server"].close()
+        await service["server"].wait_closed()
+
+def test_serve_stream_rejects_malformed_lengths():
+    for message in (HEADER.pack(3) + b"\x00" * 3, # half a sample
+                    HEADER.pack(0xFFFFFFFF), # 4 GB announced, nothing sent
+                    HEADER.pack(2048) + b"\x00" * 2048): # over a 1024-byte limit
+        replies, streams = asyncio.run(send_raw(message, max_payload=1024))
+        assert len(replies) == 1 and replies[0]["final"] and "bad message length" in replies[0]["error"]
+        assert not streams
+
+def test_serve_stream_accepts_well_formed_chunks():
+    samples = (np.random.default_rng(1).normal(size=4000) * 3000).astype("<i2").tobytes()
+    replies, streams = asyncio.run(send_raw(HEADER.pack(len(samples)) + samples + HEADER.pack(0), max_payload=len(samples)))
+    assert [reply.get("final", False) for reply in replies] == [False, True] and "error" not in replies[-1]
+    assert replies[-1]["speaker"] in (1, 2, 3) and not streams
+
+def test_stream_decision_matches_offline():
+    signal = 0.1 * np.random.default_rng(2).normal(size=20000) # broadband: top_db clips nothing, running peak or not
+    codebooks = synthetic_codebooks()
+    stream = open_stream(codebooks, dtype=np.float64)
+    for start in range(0, len(signal), 1234):
+        update_stream(stream, signal[start:start + 1234])
+    decision = update_stream(stream, None)
+    (mfccs,) = compute_mfcc_batch([signal], 16000, dtype=np.float64)
+    distortions, speaker_ids = average_distortions([mfccs.T], codebooks)
+    assert decision["frames"] == mfccs.shape[1] and decision["speaker"] == identify([mfccs.T], codebooks)[0]
+    assert decision["distortion"] == pytest.approx(distortions[0].min(), rel=1e-9)
+
+def test_replay_matches_offline(tmp_path):
+    signal = (0.1 * np.random.default_rng(3).normal(size=24000)).astype(np.float32)
+    path = str(tmp_path / "noise.wav")
+    sf.write(path, signal, 16000, subtype="FLOAT")
+    codebooks = synthetic_codebooks()
+    finals, latencies = run_replay([path, path], codebooks, chunk_size=1000)
+    pcm = (np.clip(signal, -1.0, 1.0) * 32767).astype("<i2").astype(np.float32) / 32768.0 # what the client sends
+    (mfccs,) = compute_mfcc_batch([pcm], 16000)
+    distortions, _ = average_distortions([mfccs.T], codebooks)
+    for final in finals:
+        assert final["final"] and final["frames"] == mfccs.shape[1] and final["speaker"] == identify([mfccs.T], codebooks)[0]
+        assert final["distortion"] == pytest.approx(distortions[0].min(), rel=1e-4)
+    assert set(latencies["all"]) == {"p50", "p90", "p99"}
@@ -0,0 +1,27 @@
+import numpy as np
+
+from vqspeaker.features import open_mfcc_stream, push_samples
+from vqspeaker.vad import open_vad_stream, speech_mask, stream_speech
+
+def bursts(sr=16000, seed=0): # 0.5 s tone bursts between 0.5 s of faint noise
+    rng = np.random.default_rng(seed)
+    t = np.arange(sr // 2) / sr
+    tone = 0.5 * np.sin(2 * np.pi * 300 * t)
+    parts = [0.001 * rng.normal(size=sr // 2) + (tone if i % 2 else 0) for i in range(8)]
+    return np.concatenate(parts).astype(np.float32)
+
+def test_stream_speech_follows_speech_mask():
+    signal = bursts()
+    frames = np.lib.stride_tricks.sliding_window_view(np.pad(signal, 512), 1024)[::256]
+    streamed = np.concatenate([stream_speech(state, frames[i:i + 7]) for state in [open_vad_stream()] for i in range(0, len(frames), 7)])
+    assert np.array_equal(streamed, stream_speech(open_vad_stream(), frames)) # chunking does not change the mask
+    offline = speech_mask(signal)
+    assert len(streamed) == len(offline) and np.array_equal(streamed, offline) # every burst is as loud as the first: the running peak is the file peak
+
+def test_mfcc_stream_vad_drops_silence():
+    signal = bursts()
+    counts = []
+    for vad in (False, True):
+        stream = open_mfcc_stream(vad=vad)
+        counts.append(sum(len(push_samples(stream, signal[i:i + 1000])) for i in range(0, len(signal), 1000)) + len(push_samples(stream, None)))
+    assert counts[1] < 0.7 * counts[0]
@@ -0,0 +1,35 @@
+import numpy as np
+
+from vqspeaker.store import open_feature_store, speaker_views, write_feature_store
+from vqspeaker.vq import lbg_train, minibatch_train, train_vq_codebook_per_speaker
+
+def test_lbg_train_fewer_frames_than_cells():
+    for features in (np.ones((10, 3), np.float32), np.random.default_rng(0).normal(size=(5, 3))):
+        codebook, levels = lbg_train(features, 16)
+        assert codebook.shape == (16, 3) and codebook.dtype == features.dtype and np.isfinite(codebook).all()
+        assert all(iterations < 100 for _, _, iterations in levels) # stops once every frame sits on a centroid
+
+def test_minibatch_train_small_first_batch():
+    codebook, _ = minibatch_train(np.random.default_rng(0).normal(size=(10, 3)).astype(np.float32), 16, batch_size=8)
+    assert codebook.shape == (16, 3) and np.isfinite(codebook).all()
+
+def speaker_frames(seed=0): # speaker -> per-file (frames, 26) matrices
+    rng = np.random.default_rng(seed)
+    return {speaker_id: [(rng.normal(size=(300 + 17 * j, 26)) + speaker_id).astype(np.float32) for j in range(3)] for speaker_id in range(1, 5)}
+
+def test_parallel_training_matches_serial():
+    mfcc_features = speaker_frames()
+    for batch_size in (None, 256): # LBG on stacked frames, mini-batch on the per-file matrices
+        serial = train_vq_codebook_per_speaker(mfcc_features, 16, batch_size, num_workers=1)
+        parallel = train_vq_codebook_per_speaker(mfcc_features, 16, batch_size, num_workers=2)
+        assert list(parallel) == list(serial)
+        for speaker_id, codebook in serial.items():
+            assert codebook.shape == (16, 26)
+            np.testing.assert_array_equal(parallel[speaker_id], codebook)
+
+def test_parallel_training_from_feature_store(tmp_path):
+    views = speaker_views(open_feature_store(write_feature_store(str(tmp_path / "store"), speaker_frames())))
+    serial = train_vq_codebook_per_speaker(views, 16, num_workers=1)
+    parallel = train_vq_codebook_per_speaker(views, 16, num_workers=2) # memmap views are reopened by the workers
+    for speaker_id, codebook in serial.items():
+        np.testing.assert_array_equal(parallel[speaker_id], codebook)
@@ -0,0 +1,57 @@
+"""Energy and zero-crossing voice activity detection, on the same frame grid as the MFCCs."""
+
+from math import gcd
+
+import numpy as np
+
+VAD_PARAMS = {"range_db": 30.0, "floor_db": 6.0, "weak_db": 10.0, "zcr": 0.25, "hangover": 6} # speech_mask defaults, part of the feature cache key
+
+def frame_statistics(signal, n_fft=1024, hop_length=256): # per-frame log energy (dB) and zero-crossing rate, framed like compute_mfcc
+    # per-block sums over blocks of gcd(n_fft, hop_length) samples, then window sums from their running sums: O(samples)
+    # whatever n_fft is, in the signal's dtype; only the block sums are float64
+    padded = np.pad(np.asarray(signal), n_fft // 2) # center=True
+    block = gcd(n_fft, hop_length)
+    n_blocks = len(padded) // block
+    blocks = padded[:n_blocks * block].reshape(n_blocks, block)
+    energy = np.concatenate([[0.0], np.cumsum(np.einsum("ij,ij->i", blocks, blocks, dtype=np.float64))])
+    signs = np.signbit(padded)
+    changes = np.append(signs[1:] != signs[:-1], False)[:n_blocks * block] # changes[i]: sign flips between samples i and i + 1
+    crossings = np.concatenate([[0], np.cumsum(np.count_nonzero(changes.reshape(n_blocks, block), axis=1))])
+    starts = np.arange(1 + (len(padded) - n_fft) // hop_length) * (hop_length // block) # in blocks
+    ends = starts + n_fft // block
+    return 10.0 * np.log10(np.maximum((energy[ends] - energy[starts]) / n_fft, 1e-10)), (crossings[ends] - crossings[starts]) / n_fft
+
+def speech_mask(signal, n_fft=1024, hop_length=256, **params): # bool per MFCC frame; params override VAD_PARAMS
+    # frames within range_db of the loudest and floor_db above the noise floor are speech; frames up to weak_db quieter count
+    # too when their zero-crossing rate says fricative; every speech frame keeps the next hangover frames (pauses, decays)
+    params = dict(VAD_PARAMS, **params)
+    energy_db, crossing_rate = frame_statistics(signal, n_fft, hop_length)
+    floor, peak = np.percentile(energy_db, [5, 99]) # percentiles, so clicks and dropouts do not set the scale
+    threshold = max(peak - params["range_db"], floor + params["floor_db"])
+    speech = (energy_db > threshold) | ((energy_db > threshold - params["weak_db"]) & (crossing_rate > params["zcr"]))
+    speech = np.convolve(speech, np.ones(params["hangover"] + 1), mode="full")[:len(speech)] > 0
+    return speech if speech.any() else np.ones_like(speech) # nothing above threshold: keep the file rather than drop it
+
+def open_vad_stream(**params): # causal speech_mask state for push_samples; params override VAD_PARAMS
+    return {"params": dict(VAD_PARAMS, **params), "peak": -np.inf, "floor": np.inf, "frames": 0, "last_speech": -np.inf}
+
+def stream_speech(state, frames): # bool per (n_fft) frame, frames in stream order across calls
+    # speech_mask with a running peak and floor in place of whole-file percentiles (it cannot see the rest of the stream),
+    # and the hangover carried over from the previous call; early frames are judged against a lower peak than later ones,
+    # so a frame must also clear floor_db above the floor, weak (fricative) frames included: noise before the first loud
+    # frame is not speech
+    params = state["params"]
+    n_fft = frames.shape[1]
+    energy_db = 10.0 * np.log10(np.maximum(np.einsum("ij,ij->i", frames, frames, dtype=np.float64) / n_fft, 1e-10))
+    signs = np.signbit(frames)
+    crossing_rate = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / n_fft
+    peak = np.maximum(np.maximum.accumulate(energy_db), state["peak"])
+    floor = np.minimum(np.minimum.accumulate(energy_db), state["floor"])
+    threshold = np.maximum(peak - params["range_db"], floor + params["floor_db"])
+    speech = (energy_db > threshold) | ((energy_db > threshold - params["weak_db"]) & (crossing_rate > params["zcr"]))
+    speech &= energy_db > floor + params["floor_db"]
+    positions = state["frames"] + np.arange(len(frames))
+    last_speech = np.maximum(np.maximum.accumulate(np.where(speech, positions, -np.inf)), state["last_speech"])
+    if len(frames):
+        state.update(peak=peak[-1], floor=floor[-1], frames=positions[-1] + 1, last_speech=last_speech[-1])
+    return positions - last_speech <= params["hangover"]
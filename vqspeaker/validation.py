@@ -0,0 +1,62 @@
+"""Check pipeline variants (reduced precision, VAD) against the reference pipeline's decisions."""
+
+import time
+
+import numpy as np
+
+from .audio import fast_load, lowpass_filter, normalize_audio
+from .features import compute_mfcc_batch
+from .matching import average_distortions, best_speakers
+from .vad import speech_mask
+from .vq import train_vq_codebook_per_speaker
+
+def featurize_paths(paths, dtype=None, preprocess=True, sr=16000, vad=False): # load -> (normalize, lowpass) -> (VAD) -> MFCC, (frames, n_mfcc) each
+    signals = [fast_load(path, sr=sr, dtype=dtype)[0] for path in paths]
+    if preprocess: # process_audio / process_test_audio chain; the 2024/2025 sets skip it
+        signals = [lowpass_filter(normalize_audio(signal, dtype), sr) for signal in signals]
+    masks = [speech_mask(signal) for signal in signals] if vad else None # after the lowpass, before the MFCC
+    return [m.T for m in compute_mfcc_batch(signals, sr, dtype=dtype, masks=masks)]
+
+def identify_with_dtype(train_files, test_files, dtype, preprocess=True, num_clusters=16, sr=16000):
+    # train_files: speaker -> list of paths; runs load -> (normalize, lowpass) -> MFCC -> LBG -> matching in dtype
+    train_features = {speaker_id: featurize_paths(paths, dtype, preprocess, sr) for speaker_id, paths in train_files.items()}
+    codebooks = train_vq_codebook_per_speaker(train_features, num_clusters)
+    distortions, speaker_ids = average_distortions(featurize_paths(test_files, dtype, preprocess, sr), codebooks)
+    return best_speakers(distortions, speaker_ids), distortions
+
+def validate_dtype(train_files, test_files, dtype=np.float32, reference=np.float64, **kwargs):
+    decisions, distortions = identify_with_dtype(train_files, test_files, dtype, **kwargs)
+    ref_decisions, ref_distortions = identify_with_dtype(train_files, test_files, reference, **kwargs)
+    mismatches = [(test_files[i], ref, got) for i, (ref, got) in enumerate(zip(ref_decisions, decisions)) if ref != got]
+    return {
+        "agreement": 1 - len(mismatches) / len(test_files),
+        "mismatches": mismatches, # (file, reference decision, decision)
+        "max_rel_distortion_diff": float(np.max(np.abs(distortions - ref_distortions) / ref_distortions)),
+    }
+
+def vad_report(train_files, test_files, true_ids, preprocess=True, num_clusters=16, sr=16000, repeats=3):
+    # the same data set without and with VAD: frames kept, best-of-repeats featurize / train / score time, accuracy;
+    # the second row also carries frames_removed, per-stage speedup and accuracy_change against the first
+    def timed(func): # (best wall time, result)
+        times = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            result = func()
+            times.append(time.perf_counter() - start)
+        return min(times), result
+
+    featurize_paths(test_files[:1], None, preprocess, sr, True) # untimed warm-up: imports, filter and MFCC bases
+    rows = []
+    for vad in (False, True):
+        featurize_time, (train_features, test_features) = timed(lambda: ({speaker_id: featurize_paths(paths, None, preprocess, sr, vad) for speaker_id, paths in train_files.items()},
+                                                                         featurize_paths(test_files, None, preprocess, sr, vad)))
+        train_time, codebooks = timed(lambda: train_vq_codebook_per_speaker(train_features, num_clusters))
+        score_time, decisions = timed(lambda: best_speakers(*average_distortions(test_features, codebooks)))
+        rows.append({"vad": vad, "frames": sum(len(m) for features in train_features.values() for m in features) + sum(len(m) for m in test_features),
+                     "featurize_seconds": featurize_time, "train_seconds": train_time, "score_seconds": score_time,
+                     "accuracy": float(np.mean([a == b for a, b in zip(decisions, true_ids)]))})
+    base, row = rows
+    row["frames_removed"] = 1 - row["frames"] / base["frames"]
+    row["speedup"] = {stage: base[f"{stage}_seconds"] / row[f"{stage}_seconds"] for stage in ("featurize", "train", "score")}
+    row["accuracy_change"] = row["accuracy"] - base["accuracy"]
+    return rows
@@ -0,0 +1,172 @@
+"""Vector quantization: LBG codebook training."""
+
+import numpy as np
+
+from .parallel import BLAS_THREADS, attach_array, parallel_map, share_arrays
+
+def normalize_mfcc(mfcc_features):
+    mfcc_features = np.vstack(mfcc_features)
+    mean = np.mean(mfcc_features, axis=0)
+    std = np.std(mfcc_features, axis=0)
+    return (mfcc_features - mean) / std
+
+def nearest_centroids(features, codebook): # index and squared distance of each frame's closest centroid
+    # ||x||^2 - 2 x.c + ||c||^2, one matmul instead of a (frames, centroids, dim) difference tensor
+    sq_dist = np.einsum("ij,ij->i", features, features)[:, None] - 2 * features @ codebook.T + np.einsum("ij,ij->i", codebook, codebook)
+    nearest = np.argmin(sq_dist, axis=1)
+    return nearest, np.maximum(sq_dist[np.arange(len(features)), nearest], 0)
+
+def cell_sums(features, nearest, k): # float64 per-centroid sums of the assigned frames
+    dim = features.shape[1]
+    return np.bincount((nearest[:, None] * dim + np.arange(dim)).ravel(), weights=features.ravel(), minlength=k * dim).reshape(k, dim)
+
+def lloyd(features, codebook, threshold=1e-3, max_iter=100): # refine codebook from its current centroids
+    k = len(codebook)
+    prev_distortion = np.inf
+    # rounding of the expanded ||x - c||^2 in nearest_centroids: a mean distance at or below this is zero
+    floor = np.sqrt(np.finfo(codebook.dtype).eps * np.mean(np.einsum("ij,ij->i", features, features), dtype=np.float64))
+    for iteration in range(1, max_iter + 1):
+        nearest, sq_dist = nearest_centroids(features, codebook)
+        distortion = np.mean(np.sqrt(sq_dist), dtype=np.float64) # mean euclidean distance, same measure as scipy kmeans
+        if distortion <= floor: # every frame sits on a centroid, nothing left to move
+            break
+        counts = np.bincount(nearest, minlength=k)
+        sums = cell_sums(features, nearest, k)
+        empty = counts == 0
+        codebook = np.where(empty[:, None], codebook, sums / np.maximum(counts, 1)[:, None]).astype(codebook.dtype)
+        if empty.any(): # re-seed empty cells with the frames that fit their centroid worst
+            worst = np.argsort(sq_dist)[::-1][:empty.sum()] # fewer frames than empty cells: the rest keep their centroid
+            codebook[np.flatnonzero(empty)[:len(worst)]] = features[worst]
+        elif (prev_distortion - distortion) / distortion < threshold: # relative improvement stalled
+            break
+        prev_distortion = distortion
+    return codebook, distortion, iteration
+
+def lbg_train(features, num_clusters=16, epsilon=0.01, threshold=1e-3, max_iter=100): # codebook + per-level (size, distortion, iterations)
+    # one split-and-refine path, no restarts: faster than lbg_kmeans (best of 20 k-means restarts per level) but usually at a
+    # higher final distortion, by an amount that depends on the data; benchmark_lbg reports both for a given set of frames
+    features = np.asarray(features)
+    if not np.issubdtype(features.dtype, np.floating):
+        features = features.astype(np.float64)
+    codebook = features.mean(axis=0, dtype=np.float64)[None, :].astype(features.dtype)
+    levels = []
+    while codebook.shape[0] < num_clusters:
+        split, kept = codebook, codebook[:0]
+        if 2 * len(codebook) > num_clusters: # last level of a non power of two: split only the most populated cells
+            order = np.argsort(np.bincount(nearest_centroids(features, codebook)[0], minlength=len(codebook)))[::-1]
+            split, kept = codebook[order[:num_clusters - len(codebook)]], codebook[order[num_clusters - len(codebook):]]
+        codebook = np.vstack([split * (1 + epsilon), split * (1 - epsilon), kept]) # split centroids
+        codebook, distortion, iterations = lloyd(features, codebook, threshold, max_iter) # warm start from the split
+        levels.append((codebook.shape[0], float(distortion), iterations))
+    return codebook, levels
+
+def lbg_algorithm(features, num_clusters=16, epsilon=0.01, threshold=1e-3): # codebook comes back in the dtype of features
+    codebook, _ = lbg_train(features, num_clusters, epsilon, threshold)
+    return codebook
+
+def lbg_kmeans(features, num_clusters=16, epsilon=0.01): # previous trainer: k-means restarted at every level, benchmark baseline
+    from scipy.cluster.vq import kmeans
+    features = np.asarray(features, dtype=np.float64) # scipy kmeans may never meet its threshold on float32 input
+    codebook, _ = kmeans(features, 1)
+    while codebook.shape[0] < num_clusters:
+        new_codebook = np.vstack([codebook * (1 + epsilon), codebook * (1 - epsilon)])
+        new_codebook, _ = kmeans(features, new_codebook.shape[0])
+        codebook = new_codebook
+    return codebook
+
+def frame_batches(source, batch_size=4096, rng=None): # fixed-size batches from an array/memmap, list of matrices or generator
+    if isinstance(source, np.ndarray): # memmap included: only the rows of one batch are paged in
+        starts = np.arange(0, len(source), batch_size)
+        if rng is not None:
+            starts = rng.permutation(starts) # shuffle block order, reads stay contiguous
+        for start in starts:
+            yield np.asarray(source[start:start + batch_size])
+        return
+    pending, size = [], 0
+    for matrix in source: # re-batch per-file matrices without stacking more than one batch
+        while len(matrix):
+            take = matrix[:batch_size - size]
+            pending.append(take)
+            size += len(take)
+            matrix = matrix[len(take):]
+            if size == batch_size:
+                yield np.concatenate(pending)
+                pending, size = [], 0
+    if pending:
+        yield np.concatenate(pending)
+
+def source_epoch(source, batch_size, rng): # a callable source is re-opened every epoch, a generator only lasts one
+    return frame_batches(source() if callable(source) else source, batch_size, rng)
+
+def minibatch_train(source, num_clusters=16, batch_size=4096, epochs=3, epsilon=0.01, refine=0, threshold=1e-3, seed=0):
+    # source: (frames, dim) array or memmap, list of per-file matrices, or a callable returning an iterable of matrices
+    # returns codebook + per-pass (epoch, mean distortion, frames seen); refine = full-pass Lloyd iterations at the end
+    rng = np.random.default_rng(seed)
+    codebook, counts, history = None, None, []
+    for epoch in range(1, epochs + 1):
+        total, n_frames = 0.0, 0
+        for batch in source_epoch(source, batch_size, rng):
+            if codebook is None: # initial codebook: split-and-refine LBG on the first batch
+                codebook, _ = lbg_train(batch, num_clusters, epsilon, threshold)
+                counts = np.zeros(len(codebook))
+            nearest, sq_dist = nearest_centroids(batch.astype(codebook.dtype, copy=False), codebook)
+            total += np.sum(np.sqrt(sq_dist), dtype=np.float64)
+            n_frames += len(batch)
+            batch_counts = np.bincount(nearest, minlength=len(codebook))
+            sums = cell_sums(batch, nearest, len(codebook))
+            counts += batch_counts
+            hit = batch_counts > 0
+            rate = batch_counts[hit] / counts[hit] # per-centroid learning rate, decays as 1/frames assigned so far
+            codebook[hit] += (rate[:, None] * (sums[hit] / batch_counts[hit, None] - codebook[hit])).astype(codebook.dtype)
+        if n_frames == 0:
+            raise ValueError("minibatch_train: source yielded no frames")
+        history.append((epoch, float(total / n_frames), n_frames))
+        if not callable(source) and not isinstance(source, (np.ndarray, list, tuple)):
+            break # one-shot generator, nothing left for another epoch
+    for iteration in range(refine): # exact Lloyd steps with sums and counts streamed over the whole source
+        sums, counts, total, n_frames = np.zeros(codebook.shape), np.zeros(len(codebook)), 0.0, 0
+        for batch in source_epoch(source, batch_size, None):
+            nearest, sq_dist = nearest_centroids(batch.astype(codebook.dtype, copy=False), codebook)
+            sums += cell_sums(batch, nearest, len(codebook))
+            counts += np.bincount(nearest, minlength=len(codebook))
+            total += np.sum(np.sqrt(sq_dist), dtype=np.float64)
+            n_frames += len(batch)
+        if n_frames == 0:
+            break # one-shot generator already consumed
+        hit = counts > 0 # empty cells keep their centroid
+        codebook[hit] = (sums[hit] / counts[hit, None]).astype(codebook.dtype)
+        history.append((epochs + iteration + 1, float(total / n_frames), n_frames))
+        if len(history) > 1 and (history[-2][1] - history[-1][1]) / history[-1][1] < threshold:
+            break
+    return codebook, history
+
+def train_codebook(features, num_clusters=16, batch_size=None, seed=0, **minibatch_params): # one speaker's (or phrase's) codebook
+    if batch_size:
+        codebook, _ = minibatch_train(features, num_clusters, batch_size, seed=seed, **minibatch_params)
+        return codebook
+    if not isinstance(features, np.ndarray): # already one matrix, e.g. a feature store view
+        features = np.vstack(features)  # combine features of this guy
+    return lbg_algorithm(features, num_clusters)  # train with lbg
+
+def train_shared_codebook(task): # worker side: frames come from shared memory, not the pickle
+    spec, num_clusters, batch_size, seed, minibatch_params = task
+    return train_codebook(attach_array(spec), num_clusters, batch_size, seed, **minibatch_params)
+
+def train_vq_codebook_per_speaker(mfcc_features, num_clusters=16, batch_size=None, num_workers=1, seed=0, blas_threads=BLAS_THREADS, **minibatch_params):
+    # batch_size set: mini-batch training, per-file matrices are streamed instead of stacked
+    # num_workers > 1: one task per speaker over a process pool; frames are packed once into shared memory, feature
+    # store views are reopened read-only by each worker instead
+    # each speaker gets its own seed from (seed, position), so results don't depend on num_workers
+    keys = list(mfcc_features)
+    seeds = [np.random.SeedSequence([seed, i]) for i in range(len(keys))]
+    if num_workers <= 1 or len(keys) <= 1:
+        return {key: train_codebook(mfcc_features[key], num_clusters, batch_size, task_seed, **minibatch_params) for key, task_seed in zip(keys, seeds)}
+    block, specs = share_arrays([mfcc_features[key] for key in keys])
+    try:
+        tasks = [(spec, num_clusters, batch_size, task_seed, minibatch_params) for spec, task_seed in zip(specs, seeds)]
+        codebooks = parallel_map(train_shared_codebook, tasks, num_workers, blas_threads=blas_threads)
+    finally:
+        if block is not None:
+            block.close()
+            block.unlink()
+    return dict(zip(keys, codebooks))